@@ -7,19 +7,34 @@
 # 95832 Miguel Cunha
 
 import sys
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import queue
+import time
 import numpy as np
 import copy
+from collections import OrderedDict
 from typing import Tuple
 from search import (
     Problem,
     Node,
+    LimitedProblem,
+    SearchLimitExceeded,
+    SearchProgress,
     astar_search,
+    benchmark_searchers,
     breadth_first_tree_search,
     depth_first_tree_search,
     greedy_search,
+    idastar_search,
     iterative_deepening_search,
     recursive_best_first_search,
+    tiebreak_policies,
 )
+from utils import integer_bounds
 
 
 class BimaruState:
@@ -34,9 +49,45 @@ class BimaruState:
     def __lt__(self, other):
         return self.id < other.id
 
+    def key(self):
+        """Identifica o tabuleiro (ver Board.nogood); é calculada a cada chamada, porque o tabuleiro ainda pode mudar."""
+        return self.board.nogood()
+
+
+class NogoodStore:
+    """Memória limitada (LRU) de sub-tabuleiros sem solução (nogoods).
+    Um nogood é a chave exata de um tabuleiro sem solução (Board.nogood), e não uma parte
+    mínima em conflito: só corta o mesmo tabuleiro quando é alcançado de novo, por outra
+    ordem dos navios (o que as procuras não detetam, porque os estados se comparam por
+    identidade), e nunca um tabuleiro diferente que contenha o mesmo conflito."""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.nogoods = OrderedDict()
+        self.hits = 0
+
+    def __contains__(self, nogood):
+        """Return True if the nogood was recorded, refreshing its LRU position."""
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            self.hits += 1
+            return True
+        return False
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def add(self, nogood):
+        """Records a nogood, evicting the least recently used one when full."""
+        self.nogoods[nogood] = True
+        self.nogoods.move_to_end(nogood)
+        if len(self.nogoods) > self.maxsize:
+            self.nogoods.popitem(last=False)
+
 
 class Board:
     """Representação interna de um tabuleiro de Bimaru."""
+    PIECES = ["T", "B", "L", "R", "C", "M"]
     
     def __init__(self, board, remaining_pieces, unfinished_hints, remaining_ships, bimaru):
         self.board = board
@@ -106,34 +157,35 @@ class Board:
             row = i
             for j in range(10):
                 col = j
-                if board[i][j] == "C":
+                if self.board[i][j] == "C":
                     self.insert_water_ontop_below(row, col)
                     self.insert_water_right_left(row, col)
                     self.insert_water_diagonals(row, col)
-                elif board[i][j] == "M":
+                elif self.board[i][j] == "M":
                     self.insert_water_diagonals(row, col)
-                elif board[i][j] in ["T", "B", "R", "L"]:
-                    if board[i][j] == "T":
+                elif self.board[i][j] in ["T", "B", "R", "L"]:
+                    if self.board[i][j] == "T":
                         self.insert_water_right_left(row, col)
                         self.insert_water_ontop(row, col)
                         self.insert_water_diagonals(row, col)
-                    elif board[i][j] == "B":
+                    elif self.board[i][j] == "B":
                         self.insert_water_right_left(row, col)
                         self.insert_water_below(row, col)
                         self.insert_water_diagonals(row, col)
-                    elif board[i][j] == "R":
+                    elif self.board[i][j] == "R":
                         self.insert_water_ontop_below(row, col)
                         self.insert_water_right(row, col)
                         self.insert_water_diagonals(row, col)
-                    elif board[i][j] == "L":
+                    elif self.board[i][j] == "L":
                         self.insert_water_ontop_below(row, col)
                         self.insert_water_left(row, col)
                         self.insert_water_diagonals(row, col)
 
     @staticmethod
-    def parse_instance():
+    def parse_instance(file=None):
         """Lê o test do standard input (stdin) que é passado como argumento
         e retorna uma instância da classe Board.
+        Se file for dado, é lido em vez do stdin.
         """
         row_hints = []
         col_hints = []
@@ -145,7 +197,7 @@ class Board:
         initial_hints = 0
         unfinished_hints = []
         
-        for line in sys.stdin:
+        for line in file if file is not None else sys.stdin:
             # Split the line into parts by tabs
             parts = line.strip().split('\t')
             # Store the corresponding values
@@ -178,6 +230,17 @@ class Board:
         return board, remaining_pieces, row_hints, col_hints, initial_hints, unfinished_hints, remaining_ships
 
 
+    def copy(self, board=None):
+        """Devolve uma cópia do tabuleiro, como copy.deepcopy mas sem o custo do deepcopy.
+        Se board for dado, é uma grelha já copiada, usada em vez de copiar a deste tabuleiro."""
+        new_board = Board.__new__(Board)
+        new_board.board = self.board.copy() if board is None else board
+        new_board.bimaru = self.bimaru
+        new_board.remaining_pieces = dict(self.remaining_pieces)
+        new_board.unfinished_hints = list(self.unfinished_hints)
+        new_board.remaining_ships = dict(self.remaining_ships)
+        return new_board
+
     def get_remaining_pieces(self):
         """Retorna o número de peças que ainda faltam colocar no tabuleiro."""
         return sum(self.remaining_pieces.values())
@@ -185,6 +248,15 @@ class Board:
     def get_empty_cells(self):
         return np.count_nonzero(self.board == "")
 
+    def nogood(self):
+        """Devolve uma chave compacta que identifica este sub-tabuleiro (exatamente).
+        A água fica de fora: cada célula de água é deduzida das peças (à volta dos navios,
+        à volta das pistas e nas linhas/colunas completas), por isso as peças, os contadores
+        de navios e as pistas por completar identificam o tabuleiro."""
+        rows, cols = np.nonzero((self.board != "") & (self.board != "W"))
+        pieces = "".join(str(row) + str(col) + self.board[row][col] for row, col in zip(rows, cols))
+        return pieces, tuple(self.remaining_ships.values()), tuple(sorted(self.unfinished_hints))
+
     """Check if specific piece can be placed in a specific position"""
     
     # A peça C só pode ter ao lado Empty (0) ou Water (W)
@@ -504,6 +576,134 @@ class Board:
         
         return self.check_place_L(row,col) and self.check_place_M_horizontal(row, col + 1) and self.check_place_M_horizontal(row, col + 2) and self.check_place_R(row, col + 3)
 
+    """
+    Early infeasibility pruning: cheap necessary conditions checked before any action is generated.
+    A slot is a line of cells where a ship could still end up; cells that are already pieces must
+    match the ship (hints), the other cells must be empty and their rows/columns must still have room.
+    """
+    SHIP_SIZES = {"1x1": 1, "1x2": 2, "1x3": 3, "1x4": 4}
+
+    def missing_pieces(self):
+        """Devolve o número de peças que faltam colocar em cada linha e em cada coluna."""
+        pieces = (self.board != "") & (self.board != "W")
+        row_missing = (np.array(self.bimaru.row_hints) - pieces.sum(axis=1)).tolist()
+        col_missing = (np.array(self.bimaru.col_hints) - pieces.sum(axis=0)).tolist()
+        return row_missing, col_missing
+
+    def slot_fits(self, row: int, col: int, size: int, vertical: bool, row_missing, col_missing):
+        """Check if a ship of the given size could still occupy the slot starting at (row, col)
+        (topmost cell for vertical slots, leftmost for horizontal ones)."""
+        if size == 1:
+            pieces = [""]
+        elif vertical:
+            pieces = ["T"] + ["M"] * (size - 2) + ["B"]
+        else:
+            pieces = ["L"] + ["M"] * (size - 2) + ["R"]
+        d_row, d_col = (1, 0) if vertical else (0, 1)
+        end_row, end_col = row + d_row * (size - 1), col + d_col * (size - 1)
+        if row < 0 or col < 0 or end_row > 9 or end_col > 9:
+            return False # cannot exceed board limits
+        # the cells right before and after the slot cannot hold a piece
+        for r, c in ((row - d_row, col - d_col), (end_row + d_row, end_col + d_col)):
+            if 0 <= r <= 9 and 0 <= c <= 9 and self.board[r][c] not in ["", "W"]:
+                return False
+        new_pieces = 0
+        for i in range(size):
+            r, c = row + d_row * i, col + d_col * i
+            value = self.board[r][c]
+            if value == "":
+                new_pieces += 1
+                # the row (vertical slot) or column (horizontal slot) of each new piece must still have room
+                if (vertical and row_missing[r] < 1) or (not vertical and col_missing[c] < 1):
+                    return False
+            elif value != pieces[i]:
+                return False
+        if vertical:
+            return new_pieces <= col_missing[col]
+        return new_pieces <= row_missing[row]
+
+    def has_slot(self, size: int, row_missing, col_missing):
+        """Check if there is still at least one slot for a ship of the given size."""
+        for row in range(10):
+            for col in range(10):
+                if self.slot_fits(row, col, size, False, row_missing, col_missing):
+                    return True
+                if size > 1 and self.slot_fits(row, col, size, True, row_missing, col_missing):
+                    return True
+        return False
+
+    def hint_has_completion(self, row: int, col: int, row_missing, col_missing):
+        """Check if an unfinished hint can still be completed into some remaining ship
+        (or is already part of a finished one)."""
+        hint = self.board[row][col]
+        for ship, size in self.SHIP_SIZES.items():
+            if size == 1:
+                continue
+            if hint == "T":
+                slots = [(row, col, True)]
+            elif hint == "B":
+                slots = [(row - size + 1, col, True)]
+            elif hint == "L":
+                slots = [(row, col, False)]
+            elif hint == "R":
+                slots = [(row, col - size + 1, False)]
+            else: # M can be any of the middle cells of a vertical or horizontal ship
+                slots = [(row - i, col, True) for i in range(1, size - 1)] + [(row, col - i, False) for i in range(1, size - 1)]
+            for slot_row, slot_col, vertical in slots:
+                if not self.slot_fits(slot_row, slot_col, size, vertical, row_missing, col_missing):
+                    continue
+                if self.remaining_ships[ship] > 0:
+                    return True
+                # no ship of this size left, but the slot may already be a finished ship
+                d_row, d_col = (1, 0) if vertical else (0, 1)
+                if all(self.board[slot_row + d_row * i][slot_col + d_col * i] != "" for i in range(size)):
+                    return True
+        return False
+
+    def count_M_cells(self, row_missing, col_missing):
+        """Return the number of empty cells where a middle piece could still be placed."""
+        counter = 0
+        for row in range(1, 9):
+            for col in range(10):
+                if self.board[row][col] == "" and row_missing[row] > 0 and col_missing[col] > 0:
+                    above, below = self.adjacent_vertical_values(row, col)
+                    if above in ["", "T", "M"] and below in ["", "B", "M"]:
+                        counter += 1
+                        continue
+                    if 0 < col < 9:
+                        left, right = self.adjacent_horizontal_values(row, col)
+                        if left in ["", "L", "M"] and right in ["", "R", "M"]:
+                            counter += 1
+        for col in range(1, 9): # middle pieces of horizontal ships in the first and last rows
+            for row in [0, 9]:
+                if self.board[row][col] == "" and row_missing[row] > 0 and col_missing[col] > 0:
+                    left, right = self.adjacent_horizontal_values(row, col)
+                    if left in ["", "L", "M"] and right in ["", "R", "M"]:
+                        counter += 1
+        return counter
+
+    def is_dead_end(self):
+        """Devolve True se já for impossível completar o tabuleiro."""
+        row_missing, col_missing = self.missing_pieces()
+        # every row and column must still fit its missing pieces in its empty cells
+        empty = self.board == ""
+        row_empty, col_empty = empty.sum(axis=1).tolist(), empty.sum(axis=0).tolist()
+        for index in range(10):
+            if not 0 <= row_missing[index] <= row_empty[index] or not 0 <= col_missing[index] <= col_empty[index]:
+                return True
+        # the remaining middle pieces must still fit somewhere
+        if self.remaining_pieces["M"] > 0 and self.count_M_cells(row_missing, col_missing) < self.remaining_pieces["M"]:
+            return True
+        # every remaining ship length must still have at least one slot
+        for ship, size in self.SHIP_SIZES.items():
+            if self.remaining_ships[ship] > 0 and not self.has_slot(size, row_missing, col_missing):
+                return True
+        # every unfinished hint must still have a completion
+        for row, col in self.unfinished_hints:
+            if not self.hint_has_completion(row, col, row_missing, col_missing):
+                return True
+        return False
+
     """Used to check if an action is already in the list, ignoring the last 2 fields"""
     def tuple_doesnt_exist(self, list, new_tuple):
         for tuple in list:
@@ -743,17 +943,17 @@ class Board:
 
     def fill_completed_row_col(self):
         """Fills the rows and colums that already have the correct number of pieces"""
-        for index in range(10):
-            if self.row_pieces_placed(index) == self.bimaru.row_hints[index]: # fill rows that are completed
-                for col in range(10):
-                    if self.board[index][col] == "":
-                        self.board[index][col] = "W"
-            if self.col_pieces_placed(index) == self.bimaru.col_hints[index]:
-                for row in range(10):
-                    if self.board[row][index] == "":
-                        self.board[row][index] = "W"
+        Board.fill_completed(self.board[np.newaxis], self.bimaru.row_hints, self.bimaru.col_hints)
+
+    @staticmethod
+    def fill_completed(grids, row_hints, col_hints):
+        """Fills with water the completed rows and columns of a stack of grids (shape (n, 10, 10)), all in one numpy call."""
+        pieces = np.isin(grids, Board.PIECES)
+        completed = ((pieces.sum(axis=2) == row_hints)[:, :, np.newaxis]
+                     | (pieces.sum(axis=1) == col_hints)[:, np.newaxis, :])
+        grids[completed & (grids == "")] = "W"
     
-    def insert_ship(self, row: int, col: int, piece: str):
+    def insert_ship(self, row: int, col: int, piece: str, fill_completed: bool = True):
         """Inserts a ship at the given position, decreases the pieces count & insert water around piece"""
         if piece == '1x1':
             # place Piece & Water around it
@@ -920,10 +1120,14 @@ class Board:
             self.remaining_pieces["TBRL"] -= 2
             self.remaining_pieces["M"] -= 2
         
-        self.fill_completed_row_col() # Fill rows and columns that are completed with water
+        if fill_completed:
+            self.fill_completed_row_col() # Fill rows and columns that are completed with water
 
 
 class Bimaru(Problem):
+    max_path_cost = 10 # every action places one of the 10 ships
+    keep_path = False # only the goal board matters, so nodes don't keep their parents alive
+
     def __init__(self, board, remaining_pieces, row_hints, col_hints, unfinished_hints, remaining_ships, initial_hints):
         """O construtor especifica o estado inicial."""
         # number of positions in the row / column with a ship cell
@@ -933,23 +1137,44 @@ class Bimaru(Problem):
         board_object = Board(board, remaining_pieces, unfinished_hints, remaining_ships, self) #Criar o Board inicial, passando o problema Bimaru para poder aceder às hints
         board_object.fill_water_around_hints() # Fill water around hints
         self.state = BimaruState(board_object)
+        self.nogoods = NogoodStore() # keys of the dead boards found so far, pruned if reached again
         super().__init__(self.state)
 
+    @staticmethod
+    def from_file(path: str):
+        """Cria o problema a partir de um ficheiro de instância, para usar como qualquer outro Problem."""
+        with open(path) as file:
+            board, remaining_pieces, row_hints, col_hints, initial_hints, unfinished_hints, remaining_ships = Board.parse_instance(file)
+        return Bimaru(board, remaining_pieces, row_hints, col_hints, unfinished_hints, remaining_ships, initial_hints)
+
     def actions(self, state: BimaruState):
         """Retorna uma lista de ações que podem ser executadas a
         partir do estado passado como argumento."""
         
         actions = []
+        nogood = state.key()
+        if nogood in self.nogoods:
+            return actions
         
-        # Cut this branch if it won´t have enough empty cells to place the remaining pieces
-        if state.board.get_empty_cells() < state.board.get_remaining_pieces() : 
+        # Cut this branch if it won´t have enough empty cells to place the remaining pieces,
+        # or if some row, column, ship, middle piece or hint can no longer be completed
+        if state.board.get_empty_cells() < state.board.get_remaining_pieces() or state.board.is_dead_end():
+            self.nogoods.add(nogood)
             return actions
         
         # First Fill all Hints
         if len(state.board.unfinished_hints) > 0:
             actions = state.board.hint_actions()
-            return actions
+        else:
+            actions = self.empty_cell_actions(state)
+        
+        if not actions:
+            self.nogoods.add(nogood) # no legal placement left, this sub-board is dead
+        return actions
 
+    def empty_cell_actions(self, state: BimaruState):
+        """Retorna as ações de colocar navios em células vazias."""
+        actions = []
         # After placing all hints, try to place ships on empty cells
             # Try to place a Ships (Horizontal and Vertical): 1x1, 1x2, 1x3, 1x4 (Centered on the topmost/left most piece)
                 # Start by placing first the bigger pieces and only then place the smaller ones
@@ -988,15 +1213,34 @@ class Bimaru(Problem):
         'state' passado como argumento. A ação a executar deve ser uma
         das presentes na lista obtida pela execução de
         self.actions(state)."""
+        return self.apply(state.board.copy(), action)
+
+    def apply(self, new_board: Board, action, fill_completed: bool = True):
+        """Executa a 'action' sobre new_board (uma cópia do tabuleiro) e devolve o novo estado."""
         row, col, ship, type, row_hint, col_hint = action
-        new_board = copy.deepcopy(state.board)
         new_state = BimaruState(new_board)
         if type == "hint":
             new_state.board.unfinished_hints.remove((row_hint, col_hint))
-        new_state.board.insert_ship(row, col, ship)
+        new_state.board.insert_ship(row, col, ship, fill_completed)
 
         return new_state
 
+    def expand_batch(self, state: BimaruState):
+        """Retorna (ação, estado, custo) para todas as ações de uma vez.
+        As grelhas de todos os filhos são copiadas da do pai numa só chamada numpy, e as suas
+        linhas e colunas completas são preenchidas com água noutra."""
+        actions = self.actions(state)
+        grid = state.board.board
+        grids = np.broadcast_to(grid, (len(actions),) + grid.shape).copy()
+        children = [(action, self.apply(state.board.copy(new_grid), action, False), 1)
+                    for action, new_grid in zip(actions, grids)]
+        Board.fill_completed(grids, self.row_hints, self.col_hints)
+        return children
+
+
+    def state_key(self, state: BimaruState):
+        """Chave compacta do estado, guardada no lugar do tabuleiro numa fronteira comprimida."""
+        return state.key()
 
     def goal_test(self, state: BimaruState):
         """Retorna True se e só se o estado passado como argumento é
@@ -1005,6 +1249,7 @@ class Bimaru(Problem):
         return state.board.get_remaining_pieces() == 0
 
 
+    @integer_bounds(0, 700)
     def h(self, node: Node):
         """Função heuristica utilizada para a procura A*."""
         if node.state.board.bimaru.initial_hints == 0 and node.state.board.remaining_ships["1x3"] == 2:
@@ -1014,20 +1259,162 @@ class Bimaru(Problem):
         empty_cells = node.state.board.get_empty_cells()
         return empty_cells 
 
+    def h_batch(self, states):
+        """Heurística h de vários estados: as células vazias de todos os tabuleiros são contadas numa só chamada numpy."""
+        if not states:
+            return []
+        if self.initial_hints == 0:
+            return [self.h(Node(state)) for state in states] # the empty board cases of h are not vectorized
+        grids = np.stack([state.board.board for state in states])
+        return np.count_nonzero(grids == "", axis=(1, 2)).tolist()
 
-if __name__ == "__main__":
-    # Ler o ficheiro do standard input, 
-    board, remaining_pieces, row_hints, col_hints, initial_hints, unfinished_hints, remaining_ships = Board.parse_instance()
-    first_board = copy.deepcopy(board)
-    # Criar uma instância do problema Bimaru,
-    problem = Bimaru(copy.deepcopy(board), remaining_pieces, row_hints, col_hints, unfinished_hints, remaining_ships, initial_hints)
+    @integer_bounds(0, 100)
+    def h_empty_cells(self, node: Node):
+        """Heurística que conta apenas as células vazias."""
+        return node.state.board.get_empty_cells()
 
-    # Usar uma técnica de procura para resolver a instância,
-    # Retirar a solução a partir do nó resultante,
-    goal_node = greedy_search(problem)
-    # Imprimir para o standard output no formato indicado.
-    if goal_node != None:
-        solved_board = np.where(goal_node.state.board.board  == 'W', '.', goal_node.state.board.board)
+
+class Profiler:
+    """Instrumentação opcional dos métodos mais usados do Bimaru.
+    Nada é substituído antes de enable(), por isso uma execução sem --profile não tem custo.
+    Guarda o número de chamadas e o tempo de cada método, um perfil de pilhas colapsadas
+    (para um flame graph), as expansões por segundo e o fator de ramificação por
+    profundidade (search.SearchProgress) e o tamanho da fronteira ao longo do tempo."""
+
+    BOARD_METHODS = ["check_place_C", "check_place_M_vertical", "check_place_M_horizontal",
+                     "check_place_T", "check_place_B", "check_place_R", "check_place_L",
+                     "check_place_1x1", "check_place_1x2_vertical", "check_place_1x2_horizontal",
+                     "check_place_1x3_vertical", "check_place_1x3_horizontal",
+                     "check_place_1x4_vertical", "check_place_1x4_horizontal",
+                     "hint_actions", "insert_ship", "fill_completed_row_col"]
+    BIMARU_METHODS = ["result", "expand_batch", "h", "h_batch"]
+
+    def __init__(self, sample_interval=0.01):
+        self.sample_interval = sample_interval # minimum time (s) between two frontier size samples
+        self.calls = {}
+        self.total_time = {}
+        self.self_time = {}
+        self.stacks = {} # collapsed stack -> self time in microseconds
+        self.stack = ["search"]
+        self.child_time = [0.0]
+        self.progress = None # SearchProgress, from enable()
+        self.frontier_sizes = []
+        self.last_sample = None
+        self.start = None
+        self.elapsed = 0.0
+        self.patched = []
+
+    def wrap(self, name, method):
+        profiler = self
+
+        def profiled(*args, **kwargs):
+            profiler.stack.append(name)
+            profiler.child_time.append(0.0)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = profiler.child_time.pop()
+                stack = ";".join(profiler.stack)
+                profiler.stack.pop()
+                profiler.child_time[-1] += elapsed
+                profiler.calls[name] = profiler.calls.get(name, 0) + 1
+                profiler.total_time[name] = profiler.total_time.get(name, 0.0) + elapsed
+                profiler.self_time[name] = profiler.self_time.get(name, 0.0) + elapsed - children
+                profiler.stacks[stack] = profiler.stacks.get(stack, 0.0) + elapsed - children
+        return profiled
+
+    def enable(self, problem):
+        """Wraps the hot methods and hooks into the search progress of the given problem."""
+        for cls, names, prefix in ((Board, self.BOARD_METHODS, "Board."), (Bimaru, self.BIMARU_METHODS, "Bimaru.")):
+            for name in names:
+                method = getattr(cls, name)
+                self.patched.append((cls, name, method))
+                setattr(cls, name, self.wrap(prefix + name, method))
+        problem.search_progress = self.search_progress
+        self.progress = SearchProgress()
+        self.start = self.progress.start
+
+    def disable(self):
+        """Restores the original methods."""
+        self.elapsed = time.perf_counter() - self.start
+        for cls, name, method in reversed(self.patched):
+            setattr(cls, name, method)
+        self.patched = []
+
+    def search_progress(self, node, branching: int, frontier_size: int):
+        self.progress.record(node, branching)
+        now = time.perf_counter() - self.start
+        if self.last_sample is None or now - self.last_sample >= self.sample_interval:
+            self.frontier_sizes.append((round(now, 6), frontier_size))
+            self.last_sample = now
+
+    def report(self):
+        """Devolve o relatório do profiling como um dicionário."""
+        expansions = self.progress.expansions
+        return {
+            "elapsed_s": self.elapsed,
+            "expansions": expansions,
+            "expansions_per_second": self.progress.expansions_per_second,
+            "mean_expansions_per_second": expansions / self.elapsed if self.elapsed else 0.0,
+            "functions": {name: {"calls": self.calls[name],
+                                 "total_s": self.total_time[name],
+                                 "self_s": self.self_time[name]} for name in sorted(self.calls)},
+            "branching_factor": self.progress.branching_factor(),
+            "frontier_size": self.frontier_sizes,
+        }
+
+    def dump(self, prefix: str):
+        """Writes <prefix>.json with the report and <prefix>.folded with the collapsed stacks."""
+        with open(prefix + ".json", "w") as file:
+            json.dump(self.report(), file, indent=2)
+        stacks = dict(self.stacks)
+        stacks["search"] = max(self.elapsed - self.child_time[0], 0.0) # time spent outside the wrapped methods
+        with open(prefix + ".folded", "w") as file:
+            for stack, seconds in sorted(stacks.items()):
+                microseconds = int(seconds * 1e6)
+                if microseconds > 0:
+                    file.write("{} {}\n".format(stack, microseconds))
+
+
+# Search algorithms and heuristics that can be chosen from the command line
+ALGORITHMS = {
+    "greedy": greedy_search,
+    "astar": astar_search,
+    "rbfs": recursive_best_first_search,
+    "idastar": functools.partial(idastar_search, table_size=100000), # the table finds transpositions by Bimaru.state_key
+    "dfs": depth_first_tree_search,
+    "bfs": breadth_first_tree_search,
+    "ids": iterative_deepening_search,
+}
+INFORMED_ALGORITHMS = ["greedy", "astar", "rbfs", "idastar"]
+TIEBREAK_ALGORITHMS = ["greedy", "astar"]
+REPLAY_ALGORITHMS = ["greedy", "astar", "bfs"]
+HEURISTICS = {"default": "h", "empty_cells": "h_empty_cells"}
+
+# Exit status when the search is stopped by one of its limits
+EXIT_LIMIT_EXCEEDED = {"time": 3, "nodes": 4, "memory": 5}
+
+
+def solve(problem, algorithm="greedy", heuristic="default", tiebreak="lifo", replay_cache=None):
+    """Resolve o problema com o algoritmo, a heurística e o desempate indicados (por nome).
+    O desempate LIFO expande menos nós do que o FIFO nestes tabuleiros.
+    replay_cache, para greedy, astar e bfs, comprime a fronteira (ver search.ReplayCache)."""
+    search = ALGORITHMS[algorithm]
+    if algorithm in REPLAY_ALGORITHMS and replay_cache:
+        search = functools.partial(search, replay_cache=replay_cache)
+    if algorithm in TIEBREAK_ALGORITHMS:
+        return search(problem, getattr(problem, HEURISTICS[heuristic]), tiebreak=tiebreak)
+    if algorithm in INFORMED_ALGORITHMS:
+        return search(problem, getattr(problem, HEURISTICS[heuristic]))
+    return search(problem)
+
+
+def print_solution(solved_board, first_board):
+    """Imprime para o standard output o tabuleiro resolvido no formato indicado."""
+    if solved_board is not None:
+        solved_board = np.where(solved_board == 'W', '.', solved_board)
         for i in range(10):
             for j in range(10):
                 if solved_board[i][j] != '.' and first_board[i][j] == '':
@@ -1039,3 +1426,201 @@ if __name__ == "__main__":
     else:
         print("No solution found")
 
+
+"""
+Portfolio solving: several strategies race on the same instance, each in its own process.
+The first one to find a solution wins and the others are killed. Every race is logged
+together with a few features of the instance, so that the logs can later be used to
+pick a strategy per kind of instance.
+"""
+DEFAULT_PORTFOLIO = ["greedy:default", "greedy:empty_cells", "astar:default", "dfs"]
+
+
+def parse_strategy(strategy: str):
+    """Converte 'algoritmo[:heurística]' no par (algoritmo, heurística)."""
+    algorithm, _, heuristic = strategy.partition(":")
+    heuristic = heuristic or "default"
+    if algorithm not in ALGORITHMS or heuristic not in HEURISTICS:
+        raise ValueError("unknown strategy: " + strategy)
+    return algorithm, heuristic
+
+
+def instance_features(board, row_hints, col_hints, initial_hints):
+    """Devolve algumas características da instância, para registar junto com a estratégia vencedora."""
+    features = {
+        "hints": initial_hints,
+        "empty_rows": row_hints.count(0),
+        "empty_cols": col_hints.count(0),
+        "max_row_hint": max(row_hints),
+        "max_col_hint": max(col_hints),
+    }
+    for letter in ["W", "C", "T", "B", "L", "R", "M"]:
+        features["hints_" + letter] = int(np.count_nonzero(board == letter))
+    return features
+
+
+def portfolio_worker(strategy, instance, limits, results):
+    """Resolve a instância com uma estratégia e envia o resultado pela fila results:
+    (estratégia, tabuleiro resolvido ou None, limite atingido ou None, tempo, mensagem de erro ou None).
+    Envia sempre um resultado, mesmo que a estratégia lance uma exceção."""
+    start = time.perf_counter()
+    try:
+        algorithm, heuristic = parse_strategy(strategy)
+        board, remaining_pieces, row_hints, col_hints, initial_hints, unfinished_hints, remaining_ships = instance
+        problem = Bimaru(board, remaining_pieces, row_hints, col_hints, unfinished_hints, remaining_ships, initial_hints)
+        goal_node = solve(LimitedProblem(problem, *limits), algorithm, heuristic)
+    except SearchLimitExceeded as error:
+        results.put((strategy, None, error.limit, time.perf_counter() - start, None))
+        return
+    except Exception as error:
+        results.put((strategy, None, None, time.perf_counter() - start, "{}: {}".format(type(error).__name__, error)))
+        return
+    solved_board = goal_node.state.board.board if goal_node is not None else None
+    results.put((strategy, solved_board, None, time.perf_counter() - start, None))
+
+
+def benchmark(paths, strategies=DEFAULT_PORTFOLIO, **options):
+    """Compara as estratégias nas instâncias dos ficheiros paths, com search.benchmark_searchers
+    (as opções são-lhe passadas: repetitions, warmup, max_time, max_nodes, csv_file, json_file...)."""
+    problems = [(os.path.basename(path), Bimaru.from_file(path)) for path in paths]
+    searchers = [functools.partial(solve, algorithm=algorithm, heuristic=heuristic)
+                 for algorithm, heuristic in map(parse_strategy, strategies)]
+    return benchmark_searchers(problems, searchers, **options)
+
+
+def solve_portfolio(instance, strategies, limits=(None, None, None), log=None):
+    """Lança uma estratégia por processo e devolve (estratégia vencedora, tabuleiro resolvido, limite atingido).
+    A vencedora é a primeira estratégia a encontrar uma solução; se nenhuma encontrar, a vencedora
+    é None e o limite é o que parou as estratégias (None se alguma esgotou a procura).
+    Uma estratégia que lance uma exceção, ou cujo processo morra sem resultado (morto, sem
+    memória...), conta como falhada: é indicada no stderr e não se espera mais por ela."""
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=portfolio_worker, args=(strategy, instance, limits, results), daemon=True)
+               for strategy in strategies]
+    for worker in workers:
+        worker.start()
+    winner, solved_board, limit, elapsed = None, None, None, None
+    limits_hit = []
+    pending = list(zip(strategies, workers))
+    try:
+        while pending:
+            try:
+                strategy, board, limit_hit, elapsed, error = results.get(timeout=0.1)
+            except queue.Empty:
+                # a worker always sends a result before exiting normally, so one
+                # that died with a non-zero exit code never will
+                for strategy, worker in list(pending):
+                    if worker.exitcode not in (None, 0):
+                        print("portfolio: {} died (exit code {})".format(strategy, worker.exitcode), file=sys.stderr)
+                        pending.remove((strategy, worker))
+                continue
+            pending.remove(next(entry for entry in pending if entry[0] == strategy))
+            if error:
+                print("portfolio: {} failed: {}".format(strategy, error), file=sys.stderr)
+            if board is not None:
+                winner, solved_board = strategy, board
+                break
+            if limit_hit:
+                limits_hit.append(limit_hit)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+    if winner is None and len(limits_hit) == len(workers):
+        limit = limits_hit[0]
+
+    board, _, row_hints, col_hints, initial_hints, _, _ = instance
+    entry = {"features": instance_features(board, row_hints, col_hints, initial_hints),
+             "strategies": strategies, "winner": winner, "elapsed_s": elapsed if winner else None}
+    print("portfolio: " + ("{} won in {:.3f}s".format(winner, elapsed) if winner else "no strategy found a solution"),
+          file=sys.stderr)
+    if log:
+        with open(log, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+    return winner, solved_board, limit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve uma instância de Bimaru lida do standard input.")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="greedy", help="search algorithm (default: greedy)")
+    parser.add_argument("--heuristic", choices=HEURISTICS, default="default",
+                        help="heuristic for greedy, astar, rbfs and idastar (default: default)")
+    parser.add_argument("--tiebreak", choices=tiebreak_policies, default="lifo",
+                        help="order among nodes with equal f, for greedy and astar (default: lifo)")
+    parser.add_argument("--replay-cache", type=int, metavar="N",
+                        help="for greedy, astar and bfs: keep no boards in the frontier, rebuild them by replaying "
+                             "actions, with a cache of N boards")
+    parser.add_argument("--time-limit", type=float, metavar="SECONDS", help="wall-clock limit for the search")
+    parser.add_argument("--max-nodes", type=int, metavar="N", help="maximum number of expanded nodes")
+    parser.add_argument("--max-rss", type=float, metavar="MB", help="maximum resident memory, in megabytes")
+    parser.add_argument("--profile", nargs="?", const="bimaru_profile", metavar="PREFIX",
+                        help="write a profiling report to PREFIX.json and PREFIX.folded")
+    parser.add_argument("--stats", metavar="FILE",
+                        help="write the search statistics to FILE (CSV if it ends in .csv, JSON otherwise)")
+    parser.add_argument("--portfolio", nargs="*", metavar="STRATEGY",
+                        help="race several ALGORITHM[:HEURISTIC] strategies in separate processes "
+                             "(default: " + " ".join(DEFAULT_PORTFOLIO) + ")")
+    parser.add_argument("--portfolio-log", metavar="FILE", help="append the instance features and the winner to FILE (JSON lines)")
+    parser.add_argument("--benchmark", nargs="+", metavar="INSTANCE",
+                        help="instead of solving stdin, benchmark the --portfolio strategies on these instance files")
+    parser.add_argument("--repetitions", type=int, default=5, help="measured runs per strategy and instance (default: 5)")
+    parser.add_argument("--benchmark-out", metavar="FILE", help="write the benchmark summary to FILE (CSV if it ends in .csv, JSON otherwise)")
+    args = parser.parse_args()
+    if args.benchmark:
+        strategies = args.portfolio or DEFAULT_PORTFOLIO
+        for strategy in strategies:
+            try:
+                parse_strategy(strategy)
+            except ValueError as error:
+                parser.error(str(error))
+        if args.repetitions < 1:
+            parser.error("--repetitions must be at least 1")
+        out = args.benchmark_out or ""
+        benchmark(args.benchmark, strategies, repetitions=args.repetitions, max_time=args.time_limit,
+                  max_nodes=args.max_nodes, csv_file=out if out.endswith(".csv") else None,
+                  json_file=out if out and not out.endswith(".csv") else None)
+        return
+    # Ler o ficheiro do standard input, 
+    board, remaining_pieces, row_hints, col_hints, initial_hints, unfinished_hints, remaining_ships = Board.parse_instance()
+    first_board = copy.deepcopy(board)
+    if args.portfolio is not None:
+        strategies = args.portfolio or DEFAULT_PORTFOLIO
+        for strategy in strategies:
+            try:
+                parse_strategy(strategy)
+            except ValueError as error:
+                parser.error(str(error))
+        instance = (board, remaining_pieces, row_hints, col_hints, initial_hints, unfinished_hints, remaining_ships)
+        winner, solved_board, limit = solve_portfolio(instance, strategies, (args.time_limit, args.max_nodes, args.max_rss),
+                                                      args.portfolio_log)
+        if limit:
+            sys.exit(EXIT_LIMIT_EXCEEDED[limit])
+        print_solution(solved_board, first_board)
+        return
+    # Criar uma instância do problema Bimaru,
+    problem = Bimaru(copy.deepcopy(board), remaining_pieces, row_hints, col_hints, unfinished_hints, remaining_ships, initial_hints)
+
+    # Usar uma técnica de procura para resolver a instância,
+    # Retirar a solução a partir do nó resultante,
+    profiler = Profiler() if args.profile else None
+    if profiler:
+        profiler.enable(problem)
+    limited = LimitedProblem(problem, args.time_limit, args.max_nodes, args.max_rss)
+    try:
+        goal_node = solve(limited, args.algorithm, args.heuristic, args.tiebreak, args.replay_cache)
+    except SearchLimitExceeded as error:
+        print(error, file=sys.stderr)
+        sys.exit(EXIT_LIMIT_EXCEEDED[error.limit])
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump(args.profile)
+        if args.stats:
+            limited.to_csv(args.stats) if args.stats.endswith(".csv") else limited.to_json(args.stats)
+    # Imprimir para o standard output no formato indicado.
+    print_solution(goal_node.state.board.board if goal_node is not None else None, first_board)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,15 @@ then create problem instances and solve them with calls to the various search
 functions.
 """
 
+import copy
+import math
+import multiprocessing
+import os
+import queue
 import sys
+import time
 from collections import deque
+from statistics import median
 
 from utils import *
 
@@ -16,7 +23,11 @@ class Problem:
     """The abstract class for a formal problem. You should subclass
     this and implement the methods actions and result, and possibly
     __init__, goal_test, and path_cost. Then you will create instances
-    of your subclass and solve them with the various search functions."""
+    of your subclass and solve them with the various search functions.
+    A subclass may also define expand_batch(state), returning the list of
+    (action, next state, step cost) triples of all the successors at once,
+    and h_batch(states), returning the h values of many states at once; the
+    searches use them, when present, to share work among siblings."""
 
     def __init__(self, initial, goal=None):
         """The constructor specifies the initial state, and possibly a goal
@@ -62,6 +73,24 @@ class Problem:
         raise NotImplementedError
 
 
+def batch_method(problem, name, replaced):
+    """Return problem's batch method called name (expand_batch or h_batch),
+    or None if it has none or if a subclass overrides one of the replaced
+    methods below the class that defines it, as the batch would bypass the
+    override. For wrappers such as InstrumentedProblem the check is made on
+    the problem they wrap."""
+    method = getattr(problem, name, None)
+    if method is None:
+        return None
+    if isinstance(problem, InstrumentedProblem):
+        return method if batch_method(problem.problem, name, replaced) else None
+    mro = type(problem).__mro__
+    owner = next((i for i, cls in enumerate(mro) if name in vars(cls)), 0)
+    if any(other in vars(cls) for cls in mro[:owner] for other in replaced):
+        return None
+    return method
+
+
 # ______________________________________________________________________________
 
 
@@ -73,7 +102,15 @@ class Node:
     the total path_cost (also known as g) to reach the node. Other functions
     may add an f and h value; see best_first_graph_search and astar_search for
     an explanation of how the f and h values are handled. You will not need to
-    subclass this class."""
+    subclass this class.
+    Nodes have __slots__ (96 bytes instead of 528 for a plain object with f
+    and h set); f and h are the only attributes that can be added to them.
+    If a problem sets keep_path = False, expand makes children without a
+    parent (depth is still counted), so that the nodes of a search whose
+    only result is the goal state don't keep all their ancestors alive;
+    path and solution then only cover the last step."""
+
+    __slots__ = ('state', 'parent', 'action', 'path_cost', 'depth', 'f', 'h')
 
     def __init__(self, state, parent=None, action=None, path_cost=0):
         """Create a search tree Node, derived from a parent by an action."""
@@ -92,9 +129,21 @@ class Node:
         return self.state < node.state
 
     def expand(self, problem):
-        """List the nodes reachable in one step from this node."""
-        return [self.child_node(problem, action)
-                for action in problem.actions(self.state)]
+        """List the nodes reachable in one step from this node.
+        If the problem has an expand_batch method, all of them are made by
+        one call to it instead of calling result once per action (unless a
+        subclass overrides actions, result or path_cost, see batch_method)."""
+        expand_batch = batch_method(problem, 'expand_batch', ('actions', 'result', 'path_cost'))
+        if expand_batch is not None:
+            children = [Node(state, self, action, self.path_cost + cost)
+                        for action, state, cost in expand_batch(self.state)]
+        else:
+            children = [self.child_node(problem, action)
+                        for action in problem.actions(self.state)]
+        if not getattr(problem, 'keep_path', True):
+            for child in children:
+                child.parent = None
+        return children
 
     def child_node(self, problem, action):
         """[Figure 3.10]"""
@@ -130,6 +179,70 @@ class Node:
         return hash(self.state)
 
 
+class ReplayCache:
+    """Compressed frontier nodes keep only their parent and action: their state
+    is replaced by problem.state_key(state) (a small hashable key, so that
+    nodes can still be compared; the state itself if the problem has no
+    state_key) or by a given key function. restore(node) rebuilds the state by
+    replaying the actions from the nearest ancestor whose state is cached.
+    Expanded nodes and the nodes on replayed paths are cached, at most
+    maxsize of them (least recently used are evicted); the state of the root
+    is always kept. This saves the memory of the states in the frontier at
+    the cost of calling problem.result again on every pop."""
+
+    def __init__(self, problem, root, maxsize, key=None):
+        self.problem = problem
+        self.maxsize = maxsize
+        self.key = key or getattr(problem, 'state_key', None) or (lambda state: state)
+        self.root = root
+        self.root_state = root.state
+        root.state = self.key(root.state)
+        self.states = collections.OrderedDict()  # id(node) -> (node, state); the node keeps its id unique
+        self.replays = 0
+
+    def put(self, node, state):
+        self.states[id(node)] = (node, state)
+        self.states.move_to_end(id(node))
+        if len(self.states) > self.maxsize:
+            self.states.popitem(last=False)
+
+    def restore(self, node):
+        """Return the state of node, replaying actions from a cached ancestor."""
+        chain = []
+        while node is not self.root and id(node) not in self.states:
+            chain.append(node)
+            node = node.parent
+        if node is self.root:
+            state = self.root_state
+        else:
+            self.states.move_to_end(id(node))
+            state = self.states[id(node)][1]
+        for node in reversed(chain):
+            state = self.problem.result(state, node.action)
+            self.replays += 1
+            if node is not chain[0]:
+                self.put(node, state)
+        return state
+
+    def compress(self, node, children):
+        """Cache the state of the expanded node, and replace the states of node
+        and its children by their keys. Children get node as their parent even
+        if the problem doesn't keep paths."""
+        self.put(node, node.state)
+        node.state = self.key(node.state)
+        for child in children:
+            child.parent = node
+            child.state = self.key(child.state)
+
+    def restore_path(self, node):
+        """Put back the states of the ancestors of node (whose state was
+        restored), so that node.path() has them."""
+        path = node.path()
+        state = path[0].state = self.root_state
+        for ancestor in path[1:-1]:
+            state = ancestor.state = self.problem.result(state, ancestor.action)
+
+
 # ______________________________________________________________________________
 
 
@@ -175,22 +288,34 @@ class SimpleProblemSolvingAgentProgram:
 # Uninformed Search algorithms
 
 
-def breadth_first_tree_search(problem):
+def breadth_first_tree_search(problem, replay_cache=None):
     """
     [Figure 3.7]
     Search the shallowest nodes in the search tree first.
     Search through the successors of a problem to find a goal.
     The argument frontier should be an empty queue.
     Repeats infinitely in case of loops.
+    If replay_cache is given, the frontier is compressed: its nodes keep no
+    state, and a state is rebuilt when its node is popped, with a ReplayCache
+    of that many states.
     """
 
-    frontier = deque([Node(problem.initial)])  # FIFO queue
+    root = Node(problem.initial)
+    replay = ReplayCache(problem, root, replay_cache, lambda state: None) if replay_cache else None
+    frontier = deque([root])  # FIFO queue
 
     while frontier:
         node = frontier.popleft()
+        if replay:
+            node.state = replay.restore(node)
         if problem.goal_test(node.state):
+            if replay:
+                replay.restore_path(node)
             return node
-        frontier.extend(node.expand(problem))
+        children = node.expand(problem)
+        if replay:
+            replay.compress(node, children)
+        frontier.extend(children)
     return None
 
 
@@ -220,18 +345,26 @@ def depth_first_graph_search(problem):
     Search through the successors of a problem to find a goal.
     The argument frontier should be an empty queue.
     Does not get trapped by loops.
-    If two paths reach a state, only use the first one.
+    Children whose state was already explored are not pushed; a state that
+    is pushed more than once is expanded only at its first (deepest) pop,
+    later copies are dropped when popped (lazy duplicate elimination), so
+    there is no scan of the frontier.
     """
+    progress = getattr(problem, 'search_progress', None)
     frontier = [(Node(problem.initial))]  # Stack
 
     explored = set()
     while frontier:
         node = frontier.pop()
+        if node.state in explored:
+            continue
         if problem.goal_test(node.state):
             return node
         explored.add(node.state)
-        frontier.extend(child for child in node.expand(problem)
-                        if child.state not in explored and child not in frontier)
+        children = [child for child in node.expand(problem) if child.state not in explored]
+        frontier.extend(children)
+        if progress:
+            progress(node, len(children), len(frontier))
     return None
 
 
@@ -240,50 +373,109 @@ def breadth_first_graph_search(problem):
     Note that this function can be implemented in a
     single line as below:
     return graph_search(problem, FIFOQueue())
+    The states in the frontier are mirrored in a hash set, together with the
+    explored ones (reached = explored + frontier), so checking whether a child
+    was already seen is O(1) instead of a scan of the frontier.
     """
+    progress = getattr(problem, 'search_progress', None)
     node = Node(problem.initial)
     if problem.goal_test(node.state):
         return node
     frontier = deque([node])
-    explored = set()
+    reached = {node.state}
     while frontier:
         node = frontier.popleft()
-        explored.add(node.state)
+        branching = 0
         for child in node.expand(problem):
-            if child.state not in explored and child not in frontier:
+            if child.state not in reached:
                 if problem.goal_test(child.state):
                     return child
                 frontier.append(child)
+                reached.add(child.state)
+                branching += 1
+        if progress:
+            progress(node, branching, len(frontier))
     return None
 
 
-def best_first_graph_search(problem, f, display=False):
+# Tie-breaking policies for best-first searches, used among nodes with equal f
+tiebreak_policies = {
+    'fifo': 'fifo',  # oldest node first
+    'lifo': 'lifo',  # newest node first
+    'deep': lambda node: -node.path_cost,  # prefer deeper g
+    'low_h': lambda node: getattr(node, 'h', 0),  # prefer lower h (as memoized by greedy_search and astar_search)
+}
+
+
+def best_first_graph_search(problem, f, display=False, tiebreak='fifo', frontier_limit=None, h_batch=None,
+                            replay_cache=None):
     """Search the nodes with the lowest f scores first.
     You specify the function f(node) that you want to minimize; for example,
     if f is a heuristic estimate to the goal, then we have greedy best
     first search; if f is node.depth then we have breadth-first search.
     There is a subtlety: the line "f = memoize(f, 'f')" means that the f
     values will be cached on the nodes as they are computed. So after doing
-    a best first search you can examine the f values of the path returned."""
+    a best first search you can examine the f values of the path returned.
+    tiebreak chooses among nodes with equal f: a key of tiebreak_policies
+    ('fifo', 'lifo', 'deep' or 'low_h') or a function of the node.
+    If f declares integer bounds (see integer_bounds) and the tiebreak is
+    'fifo' or 'lifo', the frontier is a BucketQueue instead of a heap-based
+    PriorityQueue.
+    If frontier_limit is given, the frontier is cut back to the frontier_limit
+    best nodes after every expansion (beam search), so it never holds more
+    than frontier_limit nodes between expansions; the search is no longer
+    complete.
+    If h_batch is given (see batch_heuristic), the h of all the children of
+    a node is computed by one call to it.
+    If replay_cache is given, the frontier is compressed (see ReplayCache):
+    nodes keep problem.state_key(state) instead of their state, f is
+    computed before the state is dropped, and the state is rebuilt by
+    replaying actions when the node is popped.
+    If the problem has a search_progress(node, branching, frontier_size) method,
+    it is called after every expansion (used for profiling)."""
+    bounds = getattr(f, 'priority_bounds', None)
+    tiebreak = tiebreak_policies.get(tiebreak, tiebreak)
     f = memoize(f, 'f')
+    progress = getattr(problem, 'search_progress', None)
     node = Node(problem.initial)
-    frontier = PriorityQueue('min', f)
+    replay = None
+    if replay_cache:
+        f(node)
+        replay = ReplayCache(problem, node, replay_cache)
+    if bounds and tiebreak in ('fifo', 'lifo'):
+        frontier = BucketQueue('min', f, bounds, tiebreak)
+    else:
+        frontier = PriorityQueue('min', f, tiebreak)
     frontier.append(node)
     explored = set()
     while frontier:
         node = frontier.pop()
+        if replay:
+            node.state = replay.restore(node)
         if problem.goal_test(node.state):
+            if replay:
+                replay.restore_path(node)
             if display:
                 print(len(explored), "paths have been expanded and", len(frontier), "paths remain in the frontier")
             return node
-        explored.add(node.state)
-        for child in node.expand(problem):
+        explored.add(replay.key(node.state) if replay else node.state)
+        children = node.expand(problem)
+        fill_h(children, h_batch)
+        if replay:
+            for child in children:
+                f(child)
+            replay.compress(node, children)
+        for child in children:
             if child.state not in explored and child not in frontier:
                 frontier.append(child)
             elif child in frontier:
                 if f(child) < frontier[child]:
                     del frontier[child]
                     frontier.append(child)
+        if frontier_limit and len(frontier) > frontier_limit:
+            frontier.truncate(frontier_limit)
+        if progress:
+            progress(node, len(children), len(frontier))
     return None
 
 
@@ -327,79 +519,103 @@ def iterative_deepening_search(problem):
 # Pseudocode from https://webdocs.cs.ualberta.ca/%7Eholte/Publications/MM-AAAI2016.pdf
 
 def bidirectional_search(problem):
+    """MM: bidirectional heuristic search that meets in the middle.
+    Each direction keeps its open list in indexed heaps keyed by
+    pr(n) = max(g(n) + h(n), 2 g(n)) (ties broken by lower g), by f and by g,
+    its closed list in a set, and caches h for every state it sees. The
+    backward direction searches from the goal with h estimating the distance
+    to the initial state; actions are assumed to be reversible.
+    Returns (cost, path), where path is the list of states from the initial
+    state to the goal through the meeting state, or (np.inf, None)."""
     e = 0
     if isinstance(problem, GraphProblem):
         e = problem.find_min_edge()
-    gF, gB = {Node(problem.initial): 0}, {Node(problem.goal): 0}
-    openF, openB = [Node(problem.initial)], [Node(problem.goal)]
-    closedF, closedB = [], []
-    U = np.inf
-
-    def extend(U, open_dir, open_other, g_dir, g_other, closed_dir):
+    backward_problem = copy.copy(problem)
+    backward_problem.initial, backward_problem.goal = problem.goal, problem.initial
+
+    class Direction:
+        def __init__(self, problem, start):
+            self.problem = problem
+            self.h_cache = {}
+            self.g = {start: 0}
+            self.parent = {start: None}
+            self.closed = set()
+            self.open_pr = PriorityQueue('min', lambda s: max(self.g[s] + self.h(s), 2 * self.g[s]),
+                                         tiebreak=lambda s: self.g[s])
+            self.open_f = PriorityQueue('min', lambda s: self.g[s] + self.h(s))
+            self.open_g = PriorityQueue('min', lambda s: self.g[s])
+            self.add(start)
+
+        def h(self, state):
+            if state not in self.h_cache:
+                self.h_cache[state] = self.problem.h(Node(state))
+            return self.h_cache[state]
+
+        def add(self, state):
+            for queue in (self.open_pr, self.open_f, self.open_g):
+                queue.append(state)
+
+        def remove(self, state):
+            for queue in (self.open_pr, self.open_f, self.open_g):
+                del queue[state]
+
+        def path(self, state):
+            """States from the start of this direction to state."""
+            path = []
+            while state is not None:
+                path.append(state)
+                state = self.parent[state]
+            return list(reversed(path))
+
+    forward, backward = Direction(problem, problem.initial), Direction(backward_problem, problem.goal)
+    U, meet = np.inf, None
+    if problem.initial in backward.g:
+        U, meet = 0, problem.initial
+
+    def extend(U, meet, this, other):
         """Extend search in given direction"""
-        n = find_key(C, open_dir, g_dir)
-
-        open_dir.remove(n)
-        closed_dir.append(n)
-
-        for c in n.expand(problem):
-            if c in open_dir or c in closed_dir:
-                if g_dir[c] <= problem.path_cost(g_dir[n], n.state, None, c.state):
+        n = this.open_pr.pop()
+        del this.open_f[n]
+        del this.open_g[n]
+        this.closed.add(n)
+
+        for action in this.problem.actions(n):
+            c = this.problem.result(n, action)
+            cost = this.problem.path_cost(this.g[n], n, action, c)
+            if c in this.open_pr or c in this.closed:
+                if this.g[c] <= cost:
                     continue
+                if c in this.closed:
+                    this.closed.remove(c)
+                else:
+                    this.remove(c)
 
-                open_dir.remove(c)
-
-            g_dir[c] = problem.path_cost(g_dir[n], n.state, None, c.state)
-            open_dir.append(c)
-
-            if c in open_other:
-                U = min(U, g_dir[c] + g_other[c])
-
-        return U, open_dir, closed_dir, g_dir
+            this.g[c] = cost
+            this.parent[c] = n
+            this.add(c)
 
-    def find_min(open_dir, g):
-        """Finds minimum priority, g and f values in open_dir"""
-        # pr_min_f isn't forward pr_min instead it's the f-value
-        # of node with priority pr_min.
-        pr_min, pr_min_f = np.inf, np.inf
-        for n in open_dir:
-            f = g[n] + problem.h(n)
-            pr = max(f, 2 * g[n])
-            pr_min = min(pr_min, pr)
-            pr_min_f = min(pr_min_f, f)
+            if c in other.open_pr and cost + other.g[c] < U:
+                U, meet = cost + other.g[c], c
 
-        return pr_min, pr_min_f, min(g.values())
+        return U, meet
 
-    def find_key(pr_min, open_dir, g):
-        """Finds key in open_dir with value equal to pr_min
-        and minimum g value."""
-        m = np.inf
-        node = Node(-1)
-        for n in open_dir:
-            pr = max(g[n] + problem.h(n), 2 * g[n])
-            if pr == pr_min:
-                if g[n] < m:
-                    m = g[n]
-                    node = n
-
-        return node
-
-    while openF and openB:
-        pr_min_f, f_min_f, g_min_f = find_min(openF, gF)
-        pr_min_b, f_min_b, g_min_b = find_min(openB, gB)
+    while forward.open_pr and backward.open_pr:
+        pr_min_f, pr_min_b = forward.open_pr[forward.open_pr.peek()], backward.open_pr[backward.open_pr.peek()]
+        f_min_f, f_min_b = forward.open_f[forward.open_f.peek()], backward.open_f[backward.open_f.peek()]
+        g_min_f, g_min_b = forward.g[forward.open_g.peek()], backward.g[backward.open_g.peek()]
         C = min(pr_min_f, pr_min_b)
 
         if U <= max(C, f_min_f, f_min_b, g_min_f + g_min_b + e):
-            return U
+            return U, forward.path(meet) + list(reversed(backward.path(meet)))[1:]
 
         if C == pr_min_f:
             # Extend forward
-            U, openF, closedF, gF = extend(U, openF, openB, gF, gB, closedF)
+            U, meet = extend(U, meet, forward, backward)
         else:
             # Extend backward
-            U, openB, closedB, gB = extend(U, openB, openF, gB, gF, closedB)
+            U, meet = extend(U, meet, backward, forward)
 
-    return np.inf
+    return np.inf, None
 
 
 # ______________________________________________________________________________
@@ -409,18 +625,122 @@ def bidirectional_search(problem):
 greedy_best_first_graph_search = best_first_graph_search
 
 
+def batch_heuristic(problem, h=None):
+    """Return problem.h_batch if a search with heuristic h (None meaning
+    problem.h) can use it, that is, if h is the problem's own h and no
+    subclass overrides h below h_batch; else None."""
+    h_batch = batch_method(problem, 'h_batch', ('h',))
+    if h_batch is not None and (h is None or h == problem.h):
+        return h_batch
+    return None
+
+
+def fill_h(nodes, h_batch):
+    """Compute the h of all nodes with one call to h_batch (if it is not None)
+    and store it in their h slot, where memoize(h, 'h') finds it."""
+    if h_batch is not None and nodes:
+        for node, value in zip(nodes, h_batch([node.state for node in nodes])):
+            node.h = value
+
+
 # Greedy best-first search is accomplished by specifying f(n) = h(n).
-def greedy_search(problem, h=None):
+def greedy_search(problem, h=None, tiebreak='fifo', replay_cache=None):
     """f(n) = h(n)"""
+    h_batch = batch_heuristic(problem, h)
     h = memoize(h or problem.h, 'h')
-    return best_first_graph_search(problem, h)
+    return best_first_graph_search(problem, h, tiebreak=tiebreak, h_batch=h_batch, replay_cache=replay_cache)
 
-def astar_search(problem, h=None, display=False):
+def astar_search(problem, h=None, display=False, tiebreak='fifo', replay_cache=None):
     """A* search is best-first graph search with f(n) = g(n)+h(n).
     You need to specify the h function when you call astar_search, or
-    else in your Problem subclass."""
+    else in your Problem subclass.
+    If h declares integer bounds and the problem has an integer max_path_cost,
+    f gets bounds too, so the frontier is a BucketQueue."""
+    return weighted_astar_search(problem, 1, h, display, tiebreak, replay_cache)
+
+
+def weighted_f(problem, h, w):
+    """Return f(n) = g(n) + w*h(n), with integer bounds when h has them,
+    w is an integer and the problem has a max_path_cost."""
+    f = lambda n: n.path_cost + w * h(n)
+    max_path_cost = getattr(problem, 'max_path_cost', None)
+    if hasattr(h, 'priority_bounds') and max_path_cost is not None and isinstance(w, int):
+        lo, hi = h.priority_bounds
+        f = integer_bounds(w * lo, w * hi + max_path_cost)(f)
+    return f
+
+
+def weighted_astar_search(problem, w=2, h=None, display=False, tiebreak='fifo', replay_cache=None):
+    """Weighted A* is best-first graph search with f(n) = g(n) + w*h(n).
+    With w > 1 it usually expands far fewer nodes than A*; if h is admissible,
+    the solution costs at most w times the optimal cost."""
+    h_batch = batch_heuristic(problem, h)
     h = memoize(h or problem.h, 'h')
-    return best_first_graph_search(problem, lambda n: n.path_cost + h(n), display)
+    return best_first_graph_search(problem, weighted_f(problem, h, w), display, tiebreak, h_batch=h_batch,
+                                   replay_cache=replay_cache)
+
+
+def beam_search(problem, width, h=None, w=1, display=False, tiebreak='fifo'):
+    """Best-first graph search with f(n) = g(n) + w*h(n) that keeps only the
+    width best nodes of the frontier (see frontier_limit in
+    best_first_graph_search). Memory stays bounded, but nodes cut from the
+    beam are lost, so it may return a worse solution or none at all."""
+    h_batch = batch_heuristic(problem, h)
+    h = memoize(h or problem.h, 'h')
+    return best_first_graph_search(problem, weighted_f(problem, h, w), display, tiebreak,
+                                   frontier_limit=width, h_batch=h_batch)
+
+
+def anytime_astar_search(problem, h=None, w=3, decrement=0.5, display=False):
+    """Anytime Repairing A* (ARA*) [Likhachev, Gordon and Thrun, 2003].
+    A generator that runs weighted A* with a weight going from w down to 1 in
+    steps of decrement, and yields (node, w) whenever it finds a cheaper
+    solution, whose cost is then at most w times the optimal cost.
+    Rounds don't start from scratch: states whose g improved after they were
+    expanded are set aside and reopened, with the rest of the frontier, when
+    the weight goes down. With an admissible h, the search ends once the
+    round with w = 1 is done and the last node yielded is optimal."""
+    h = memoize(h or problem.h, 'h')
+    root = Node(problem.initial)
+    best = {root.state: root}  # state -> node with the lowest path cost found so far
+    f = lambda state: best[state].path_cost + w * h(best[state])
+    frontier = PriorityQueue('min', f)
+    frontier.append(root.state)
+    closed, incons = set(), {}  # incons keeps insertion order, so reruns are repeatable
+    solution = root if problem.goal_test(root.state) else None
+    yielded = None
+    while True:
+        expanded = 0
+        while frontier and (solution is None or f(frontier.peek()) < solution.path_cost):
+            state = frontier.pop()
+            closed.add(state)
+            expanded += 1
+            for child in best[state].expand(problem):
+                if child.state in best and best[child.state].path_cost <= child.path_cost:
+                    continue
+                best[child.state] = child
+                if problem.goal_test(child.state):
+                    if solution is None or child.path_cost < solution.path_cost:
+                        solution = child
+                elif child.state in closed:
+                    incons[child.state] = True
+                else:
+                    frontier.append(child.state)
+        if display:
+            print("w =", w, ":", expanded, "paths expanded, best cost",
+                  solution.path_cost if solution else None)
+        if solution is not None and solution is not yielded:
+            yielded = solution
+            yield solution, w
+        if w <= 1 or not (frontier or incons):
+            return
+        w = max(1, w - decrement)
+        # The keys changed with w, so the frontier is rebuilt with the reopened states
+        states = [frontier.pop() for _ in range(len(frontier))] + list(incons)
+        frontier = PriorityQueue('min', f)
+        frontier.extend(states)
+        closed.clear()
+        incons.clear()
 
 
 # ______________________________________________________________________________
@@ -434,6 +754,10 @@ class EightPuzzle(Problem):
     def __init__(self, initial, goal=(1, 2, 3, 4, 5, 6, 7, 8, 0)):
         """ Define goal state and initialize a problem """
         super().__init__(initial, goal)
+        # For each index of the blank square, the (action, index offset) of its moves, as in actions
+        self.moves = [[(action, delta) for action, delta in (('UP', -3), ('DOWN', 3), ('LEFT', -1), ('RIGHT', 1))
+                       if 0 <= blank + delta < 9 and (blank // 3 == (blank + delta) // 3 or delta in (-3, 3))]
+                      for blank in range(9)]
 
     def find_blank_square(self, state):
         """Return the index of the blank square in a given state"""
@@ -495,6 +819,22 @@ class EightPuzzle(Problem):
 
         return sum(s != g for (s, g) in zip(node.state, self.goal))
 
+    def expand_batch(self, state):
+        """Return the (action, state, step cost) of all successors of state,
+        finding the blank square once for all of them."""
+        blank = state.index(0)
+        children = []
+        for action, delta in self.moves[blank]:
+            new_state = list(state)
+            new_state[blank], new_state[blank + delta] = state[blank + delta], 0
+            children.append((action, tuple(new_state), 1))
+        return children
+
+    def h_batch(self, states):
+        """Return the heuristic value of each of the given states (see h)."""
+        goal = self.goal
+        return [sum(s != g for (s, g) in zip(state, goal)) for state in states]
+
 
 # ______________________________________________________________________________
 
@@ -605,6 +945,7 @@ class PlanRoute(Problem):
 
 def recursive_best_first_search(problem, h=None):
     """[Figure 3.26]"""
+    h_batch = batch_heuristic(problem, h)
     h = memoize(h or problem.h, 'h')
 
     def RBFS(problem, node, flimit):
@@ -613,6 +954,7 @@ def recursive_best_first_search(problem, h=None):
         successors = node.expand(problem)
         if len(successors) == 0:
             return None, np.inf
+        fill_h(successors, h_batch)
         for s in successors:
             s.f = max(s.path_cost + h(s), node.f)
         while True:
@@ -635,6 +977,326 @@ def recursive_best_first_search(problem, h=None):
     return result
 
 
+def idastar_search(problem, h=None, table_size=None, stats=None, display=False):
+    """Iterative deepening A*: repeated depth-first searches that only expand
+    nodes with f = g + h <= threshold; each iteration raises the threshold to
+    the smallest f that exceeded it. Uses an explicit stack instead of recursion,
+    so memory is linear in the depth, and pushes successors so that the one
+    with the lowest f is expanded first. A child that goes back to its
+    grandparent's state is skipped.
+    If table_size is given, a transposition table of at most that many states
+    (least recently used are evicted) prunes a state reached with a g that is
+    not better than the one it was already expanded with, in this iteration or
+    in an earlier one. States are looked up by problem.state_key(state), if
+    the problem has one, else by themselves.
+    If stats is a list, a dict with the threshold and the number of expanded
+    nodes of each iteration is appended to it (display prints them)."""
+    h_batch = batch_heuristic(problem, h)
+    h = memoize(h or problem.h, 'h')
+    root = Node(problem.initial)
+    threshold = h(root)
+    table = collections.OrderedDict() if table_size else None  # state key -> (g, iteration)
+    state_key = getattr(problem, 'state_key', None) or (lambda state: state)
+    iteration = 0
+    while True:
+        expanded, next_threshold, found = 0, np.inf, None
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            f = node.path_cost + h(node)
+            if f > threshold:
+                next_threshold = min(next_threshold, f)
+                continue
+            if problem.goal_test(node.state):
+                found = node
+                break
+            if table is not None:
+                key = state_key(node.state)
+                seen = table.get(key)
+                if seen is not None and (seen[0] < node.path_cost or seen == (node.path_cost, iteration)):
+                    continue
+                table[key] = (node.path_cost, iteration)
+                table.move_to_end(key)
+                if len(table) > table_size:
+                    table.popitem(last=False)
+            expanded += 1
+            children = [child for child in node.expand(problem)
+                        if node.parent is None or child.state != node.parent.state]
+            fill_h(children, h_batch)
+            children.sort(key=lambda child: child.path_cost + h(child), reverse=True)
+            stack.extend(children)
+        if stats is not None:
+            stats.append({'threshold': threshold, 'expanded': expanded})
+        if display:
+            print('threshold', threshold, 'expanded', expanded, 'nodes')
+        if found is not None or next_threshold == np.inf:
+            return found
+        threshold = next_threshold
+        iteration += 1
+
+
+def sma_star_search(problem, max_nodes=10000, h=None, stats=None, display=False):
+    """Simplified memory-bounded A* (SMA*) [Russell, 1992]: A* that keeps at
+    most max_nodes nodes in memory. Successors are generated one at a time
+    (with problem.actions and result, not expand_batch); when memory is full,
+    the leaf with the highest f (the deepest among ties) is dropped before a
+    new child is added, or the new child itself is forgotten if its f is
+    higher still. The parent of a dropped node remembers the f of the
+    forgotten child and goes back into the frontier with the lowest such f;
+    if it becomes the best node again, the forgotten children with that f
+    are regenerated. A node whose path already fills the memory
+    gets f = infinity, as does a node without successors. With an admissible
+    h, the solution is optimal if the shallowest optimal one fits in memory.
+    A child that goes back to its grandparent's state is skipped.
+    If stats is a dict, it is filled with the number of 'expanded',
+    'dropped' and 'regenerated' nodes and the 'peak' number of nodes in
+    memory (display prints them)."""
+    h = memoize(h or problem.h, 'h')
+    root = Node(problem.initial)
+    root.f = h(root)
+    # Nodes are kept by id, since nodes for the same state may be on different paths
+    nodes = {id(root): root}
+    children = {}  # id of an expanded node -> {child state: child id} in memory
+    forgotten = {}  # id -> {dropped child state: its f}
+
+    def key(i):
+        return min(forgotten[i].values()) if forgotten.get(i) else nodes[i].f
+
+    frontier = PriorityQueue('min', key, lambda i: -nodes[i].depth)
+    leaves = PriorityQueue('max', key, lambda i: nodes[i].depth)
+    frontier.append(id(root))
+    counts = {'expanded': 0, 'dropped': 0, 'regenerated': 0, 'peak': 1}
+
+    def drop(i):
+        node = nodes[i]
+        f = key(i)
+        if i in frontier:
+            del frontier[i]
+        del leaves[i]
+        del nodes[i]
+        children.pop(i, None)
+        forgotten.pop(i, None)
+        parent = id(node.parent)
+        del children[parent][node.state]
+        forgotten.setdefault(parent, {})[node.state] = f
+        frontier.append(parent)
+        if not children[parent] and parent != expanding:
+            leaves.append(parent)
+        counts['dropped'] += 1
+
+    found = None
+    expanding = None  # the node whose children are being added, which must not be dropped
+    while frontier:
+        i = frontier.peek()
+        node = nodes[i]
+        if key(i) == np.inf:
+            break
+        if problem.goal_test(node.state):
+            found = node
+            break
+        frontier.pop()
+        counts['expanded'] += 1
+        regenerate = forgotten.get(i)
+        bound = min(regenerate.values()) if regenerate else None
+        kids = children.setdefault(i, {})
+        if i in leaves:
+            del leaves[i]
+        expanding = i
+        if node.depth < max_nodes - 1:
+            for action in problem.actions(node.state):
+                child = node.child_node(problem, action)
+                if child.state in kids or (node.parent and child.state == node.parent.state):
+                    continue
+                if regenerate is not None:
+                    if regenerate.get(child.state) != bound:
+                        continue
+                    child.f = max(child.path_cost + h(child), regenerate.pop(child.state))
+                    counts['regenerated'] += 1
+                else:
+                    child.f = max(child.path_cost + h(child), node.f)
+                if len(nodes) >= max_nodes:
+                    if not leaves or child.f > key(leaves.peek()):
+                        forgotten.setdefault(i, {})[child.state] = child.f
+                        counts['dropped'] += 1
+                        continue
+                    drop(leaves.peek())
+                j = id(child)
+                nodes[j] = child
+                kids[child.state] = j
+                frontier.append(j)
+                leaves.append(j)
+        expanding = None
+        if forgotten.get(i):
+            frontier.append(i)
+        counts['peak'] = max(counts['peak'], len(nodes))
+        if not kids:
+            if forgotten.get(i):
+                leaves.append(i)
+            else:
+                node.f = np.inf  # a dead end
+                if node.parent is None:
+                    break
+                leaves.append(i)
+                drop(i)
+    if stats is not None:
+        stats.update(counts)
+    if display:
+        print(counts['expanded'], 'expanded,', counts['dropped'], 'dropped,',
+              counts['regenerated'], 'regenerated, peak', counts['peak'], 'nodes in memory')
+    return found
+
+
+def hda_star_search(problem, workers=None, h=None, stats=None):
+    """Hash-distributed A* (HDA*) [Kishimoto, Fukunaga and Botea, 2009]: A*
+    spread over several processes (os.cpu_count() by default). Every state is
+    owned by the worker hash(state) % workers, which keeps the open and closed
+    lists for it; children are sent to their owner through its queue, in
+    batches. Messages carry (state, g, actions) and the solution node is
+    rebuilt here by replaying the actions from problem.initial.
+    When a worker finds a goal it lowers a shared incumbent cost, and workers
+    keep expanding the nodes with a lower f, so the solution is optimal if h is
+    admissible. The search ends when every worker is idle and no message is in
+    flight, which is checked with the four-counter method: two snapshots of
+    the per-worker sent/received counters must agree.
+    States must be hashable and picklable. Workers are forked, so they share
+    the hash seed of this process (str hashes are consistent) and the problem
+    and h need not be picklable. If stats is a dict, it gets the number of
+    nodes 'expanded' by each worker.
+    If a worker raises (or dies), all of them are stopped and a RuntimeError
+    with its traceback (or exit code) is raised here."""
+    workers = workers or os.cpu_count()
+    h = h or problem.h
+    ctx = multiprocessing.get_context('fork')
+    inboxes = [ctx.Queue() for _ in range(workers)]
+    results = ctx.Queue()
+    incumbent = ctx.Value('d', np.inf)
+    idle = ctx.Array('b', workers)
+    sent = ctx.Array('q', workers)
+    received = ctx.Array('q', workers)
+    stop = ctx.Event()
+    procs = [ctx.Process(target=_hda_worker, daemon=True,
+                         args=(rank, problem, h, inboxes, results, incumbent, idle, sent, received, stop))
+             for rank in range(workers)]
+    for proc in procs:
+        proc.start()
+    owner = hash(problem.initial) % workers
+    sent[owner] += 1
+    inboxes[owner].put([(problem.initial, 0, ())])
+
+    def snapshot():
+        return list(idle), list(sent), list(received)
+
+    previous = None
+    while not stop.is_set() and all(proc.exitcode is None for proc in procs):
+        time.sleep(0.001)
+        current = snapshot()
+        if all(current[0]) and sum(current[1]) == sum(current[2]) and current == previous:
+            break
+        previous = current
+    stop.set()
+    reports = {}
+    failures = {}
+    while len(reports) + len(failures) < len(procs):
+        try:
+            rank, expanded, cost, actions, error = results.get(timeout=0.1)
+        except queue.Empty:
+            # a worker always reports before exiting normally; one that exited
+            # otherwise never will
+            for rank, proc in enumerate(procs):
+                if proc.exitcode not in (None, 0) and rank not in reports:
+                    failures[rank] = 'worker {} exited with code {}'.format(rank, proc.exitcode)
+            continue
+        reports[rank] = (expanded, cost, actions)
+        if error:
+            failures[rank] = 'worker {} failed:\n{}'.format(rank, error)
+    for proc in procs:
+        proc.join()
+    if failures:
+        raise RuntimeError('hda_star_search: ' + '\n'.join(failures.values()))
+    if stats is not None:
+        stats['expanded'] = [reports[rank][0] for rank in sorted(reports)]
+    cost, actions = min((cost, actions) for expanded, cost, actions in reports.values())
+    if actions is None:
+        return None
+    node = Node(problem.initial)
+    for action in actions:
+        node = node.child_node(problem, action)
+    return node
+
+
+def _hda_worker(rank, problem, h, inboxes, results, incumbent, idle, sent, received, stop,
+                batch=64):
+    """The loop of an hda_star_search worker: expand up to batch local nodes,
+    send the children owned by other workers, then read the inbox. It always
+    reports (rank, expanded, cost, actions, error) to results; if it raises,
+    error is the traceback, and stop is set to end the other workers."""
+    try:
+        _hda_search(rank, problem, h, inboxes, results, incumbent, idle, sent, received, stop, batch)
+    except Exception:
+        import traceback
+        stop.set()
+        results.put((rank, 0, np.inf, None, traceback.format_exc()))
+
+
+def _hda_search(rank, problem, h, inboxes, results, incumbent, idle, sent, received, stop, batch):
+    """The search of _hda_worker."""
+    workers = len(inboxes)
+    inbox = inboxes[rank]
+    nodes = {}  # state -> best node generated so far, with its actions
+    closed = {}  # state -> g it was expanded with
+    frontier = PriorityQueue('min', lambda state: nodes[state][0].path_cost + h(nodes[state][0]))
+    best = (np.inf, None)
+    expanded = 0
+    outboxes = [[] for _ in range(workers)]
+
+    def add(state, g, actions):
+        if g < closed.get(state, np.inf) and (state not in nodes or g < nodes[state][0].path_cost):
+            nodes[state] = (Node(state, path_cost=g), actions)
+            frontier.append(state)
+
+    while not stop.is_set():
+        messages = []
+        try:
+            while True:
+                messages.append(inbox.get(block=not messages and idle[rank], timeout=0.01))
+        except queue.Empty:
+            pass
+        if messages:
+            idle[rank] = False
+            for message in messages:
+                for state, g, actions in message:
+                    add(state, g, actions)
+            received[rank] += len(messages)
+        for _ in range(batch):
+            if not frontier or frontier[frontier.peek()] >= incumbent.value:
+                break
+            state = frontier.pop()
+            node, actions = nodes.pop(state)
+            closed[state] = node.path_cost
+            if problem.goal_test(state):
+                with incumbent.get_lock():
+                    if node.path_cost < incumbent.value:
+                        incumbent.value = node.path_cost
+                if node.path_cost < best[0]:
+                    best = (node.path_cost, actions)
+                continue
+            expanded += 1
+            for child in node.expand(problem):
+                owner = hash(child.state) % workers
+                if owner == rank:
+                    add(child.state, child.path_cost, actions + (child.action,))
+                else:
+                    outboxes[owner].append((child.state, child.path_cost, actions + (child.action,)))
+        for owner, outbox in enumerate(outboxes):
+            if outbox:
+                sent[rank] += 1
+                inboxes[owner].put(outbox)
+                outboxes[owner] = []
+        if not frontier or frontier[frontier.peek()] >= incumbent.value:
+            idle[rank] = True
+    results.put((rank, expanded, best[0], best[1], None))
+
+
 def hill_climbing(problem):
     """
     [Figure 4.2]
@@ -1066,19 +1728,344 @@ def UndirectedGraph(graph_dict=None):
     return Graph(graph_dict=graph_dict, directed=False)
 
 
+class CSRGraph:
+    """A read-only graph in compressed sparse row (CSR) form, for graphs too
+    big for the dict of dicts of Graph. Nodes have integer ids 0..n-1; the
+    links out of node i are neighbors[offsets[i]:offsets[i + 1]] (sorted by
+    id), with lengths weights[offsets[i]:offsets[i + 1]], all NumPy arrays,
+    so an edge takes 12 bytes instead of the ~100 of a dict entry.
+    labels, if given, are the node names (label i for id i), and the graph
+    is then used with labels, like a Graph; without labels, nodes are their
+    ids. coords, if given, is an (n, 2) array of node coordinates, exposed as
+    a read-only locations mapping from node to (x, y).
+    get(a), get(a, b) and nodes() behave as in Graph, and neighbors(a) is a
+    faster list of the nodes linked from a. Build one with from_graph or
+    from_edges; to_graph converts back.
+    save writes the arrays (and the tables of a Landmarks, if given) to a
+    binary file that load maps into memory: it opens in milliseconds even
+    with millions of nodes, and only the pages that a search touches are
+    read from disk. The file is a 256-byte header (the magic string, sizes
+    and flags, and the place, size and dtype of each section), then the
+    offsets, neighbors, weights, coords, landmark tables, reverse landmark
+    tables, the labels (a LabelTable: the offsets and the bytes of each
+    label in JSON, followed by a comma) and a JSON list of the landmarks,
+    each section starting at a multiple of 64 bytes. Labels are decoded when
+    used, but the first lookup of a node by label builds the index from
+    label to id (see LabelIndex), in O(n) time; only graphs without labels
+    (whose nodes are their ids) never pay it."""
+
+    MAGIC = b'AIMACSR1'
+    VERSION = 2
+    SECTIONS = ['offsets', 'neighbors', 'weights', 'coords', 'tables', 'reverse_tables',
+                'label_offsets', 'label_bytes', 'landmarks']
+
+    def __init__(self, offsets, neighbors, weights, labels=None, coords=None, directed=True):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.neighbors_array = np.asarray(neighbors)
+        self.weights = np.asarray(weights)
+        self.labels = labels if labels is None or isinstance(labels, LabelTable) else list(labels)
+        self.index = LabelIndex(self.labels) if labels is not None else None
+        self.coords = np.asarray(coords, dtype=float) if coords is not None else None
+        self.directed = directed
+        self.landmarks = None  # the Landmarks loaded with the graph, if any
+
+    @classmethod
+    def from_edges(cls, n, sources, targets, weights, labels=None, coords=None, directed=True):
+        """Build a CSRGraph on n nodes from arrays of edge sources, targets and
+        weights (node ids); if not directed, every edge is added both ways.
+        Only NumPy operations are used, so millions of edges take seconds."""
+        sources, targets, weights = np.asarray(sources), np.asarray(targets), np.asarray(weights)
+        if not directed:
+            sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+            weights = np.concatenate([weights, weights])
+        order = np.lexsort((targets, sources))
+        sources, targets, weights = sources[order], targets[order], weights[order]
+        if len(sources) > 1:  # keep the last of repeated edges, as Graph.connect does
+            keep = np.append((sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1]), True)
+            sources, targets, weights = sources[keep], targets[keep], weights[keep]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+        id_type = np.int32 if n < 2 ** 31 else np.int64
+        return cls(offsets, targets.astype(id_type), weights, labels, coords, directed)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Build a CSRGraph with the nodes, links and locations of a Graph.
+        Nodes are numbered in sorted order (if they can be sorted); if they are
+        already 0..n-1, no labels are kept."""
+        nodes = graph.nodes()
+        try:
+            nodes.sort()
+        except TypeError:
+            pass
+        labels = None if nodes == list(range(len(nodes))) else nodes
+        index = {node: i for i, node in enumerate(nodes)}
+        links = [(index[a], index[b], d) for a, neighbors in graph.graph_dict.items() for b, d in neighbors.items()]
+        sources, targets, weights = zip(*links) if links else ((), (), ())
+        locations = getattr(graph, 'locations', None)
+        coords = [locations[node] for node in nodes] if locations else None
+        # graph_dict already holds both directions of undirected links
+        csr = cls.from_edges(len(nodes), np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64),
+                             np.array(weights), labels, coords, directed=True)
+        csr.directed = graph.directed
+        return csr
+
+    def save(self, filename, landmarks=None):
+        """Write the graph, and the tables of landmarks (a Landmarks for it)
+        if given, to a binary file for load. Labels must be JSON strings,
+        numbers or tuples of them."""
+        import json
+        import struct
+        tables = reverse_tables = None
+        names = []
+        if landmarks is not None:
+            columns = [landmarks.index[node] for node in self.nodes()] if landmarks.index is not None else slice(None)
+            tables = landmarks.tables[:, columns]
+            if landmarks.reverse_tables is not None:
+                reverse_tables = landmarks.reverse_tables[:, columns]
+            names = list(landmarks.landmarks)
+        label_offsets = label_bytes = None
+        if self.labels is not None:
+            encoded = [json.dumps(label).encode() + b',' for label in self.labels]
+            label_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(label) for label in encoded], out=label_offsets[1:])
+            label_bytes = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        arrays = [self.offsets, self.neighbors_array, self.weights, self.coords, tables, reverse_tables,
+                  label_offsets, label_bytes, np.frombuffer(json.dumps(names).encode(), dtype=np.uint8)]
+        with open(filename, 'wb') as f:
+            f.write(bytes(256))
+            sections = []
+            for array in arrays:
+                if array is None:
+                    sections.append((0, 0, b''))
+                    continue
+                array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+                f.write(bytes(-f.tell() % 64))
+                sections.append((f.tell(), array.nbytes, array.dtype.str.encode()))
+                f.write(array.tobytes())
+            flags = self.directed | (self.labels is not None) << 1
+            header = struct.pack('<8sIIqqq', self.MAGIC, self.VERSION, flags, len(self.offsets) - 1, len(self.weights),
+                                 len(names))
+            for offset, size, dtype in sections:
+                header += struct.pack('<qq8s', offset, size, dtype)
+            f.seek(0)
+            f.write(header)
+
+    @classmethod
+    def load(cls, filename):
+        """Read a graph written by save, mapping its arrays into memory
+        (read-only); landmark tables, if saved, become its landmarks."""
+        import json
+        import struct
+        with open(filename, 'rb') as f:
+            header = f.read(256)
+        magic, version, flags, n, m, k = struct.unpack_from('<8sIIqqq', header)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError('{} is not a CSRGraph file'.format(filename))
+        arrays = {}
+        for i, name in enumerate(cls.SECTIONS):
+            offset, size, dtype = struct.unpack_from('<qq8s', header, 40 + 24 * i)
+            if size:
+                dtype = np.dtype(dtype.rstrip(b'\0').decode())
+                arrays[name] = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(size // dtype.itemsize,))
+        labels = None
+        if flags & 2:
+            labels = LabelTable(arrays['label_offsets'], arrays.get('label_bytes', np.zeros(0, dtype=np.uint8)))
+        coords = arrays['coords'].reshape(n, 2) if 'coords' in arrays else None
+        graph = cls(arrays['offsets'], arrays['neighbors'], arrays['weights'], labels, coords,
+                    directed=bool(flags & 1))
+        if k:
+            graph.landmarks = Landmarks()
+            graph.landmarks.labels, graph.landmarks.index = graph.labels, graph.index
+            graph.landmarks.landmarks = [_label_from_json(node) for node in json.loads(bytes(arrays['landmarks']))]
+            graph.landmarks.tables = arrays['tables'].reshape(k, n)
+            if 'reverse_tables' in arrays:
+                graph.landmarks.reverse_tables = arrays['reverse_tables'].reshape(k, n)
+        return graph
+
+    def to_graph(self):
+        """Return the same graph as a Graph (with its locations, if any)."""
+        graph = Graph({node: self.get(node) for node in self.nodes()}, directed=self.directed)
+        if self.coords is not None:
+            graph.locations = dict(self.locations)
+        return graph
+
+    def id(self, node):
+        """The integer id of a node."""
+        return self.index[node] if self.index is not None else node
+
+    def node(self, i):
+        """The node with integer id i."""
+        return self.labels[i] if self.labels is not None else i
+
+    def neighbors(self, a):
+        """Return a list of the nodes linked from a."""
+        i = self.id(a)
+        ids = self.neighbors_array[self.offsets[i]:self.offsets[i + 1]].tolist()
+        return ids if self.labels is None else [self.labels[j] for j in ids]
+
+    def get(self, a, b=None):
+        """Return a link distance or a dict of {node: distance} entries.
+        .get(a,b) returns the distance or None;
+        .get(a) returns a dict of {node: distance} entries, possibly {}."""
+        i = self.id(a)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        if b is None:
+            return dict(zip(self.neighbors(a), self.weights[start:end].tolist()))
+        j = self.id(b)
+        k = start + np.searchsorted(self.neighbors_array[start:end], j)
+        if k < end and self.neighbors_array[k] == j:
+            return self.weights[k].item()
+        return None
+
+    def nodes(self):
+        """Return a list of nodes in the graph."""
+        if isinstance(self.labels, LabelTable):
+            return self.labels.list()
+        return list(self.labels) if self.labels is not None else list(range(len(self.offsets) - 1))
+
+    @property
+    def locations(self):
+        """A mapping from node to (x, y), or None without coordinates."""
+        return CoordinateView(self) if self.coords is not None else None
+
+
+def _label_from_json(value):
+    """A label decoded from JSON, with its lists turned back into tuples
+    (JSON has no tuples, and labels must be hashable)."""
+    return tuple(_label_from_json(item) for item in value) if isinstance(value, list) else value
+
+
+class LabelTable(collections.abc.Sequence):
+    """The labels of a CSRGraph loaded from a file: label i is the JSON text
+    data[offsets[i]:offsets[i + 1] - 1] (followed by a comma), decoded when
+    it is read; list() decodes them all at once."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __getitem__(self, i):
+        import json
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return _label_from_json(json.loads(bytes(self.data[self.offsets[i]:self.offsets[i + 1] - 1])))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def list(self):
+        """All the labels, as a list."""
+        import json
+        return [_label_from_json(label) for label in json.loads(b'[' + bytes(self.data[:-1]) + b']')]
+
+
+class LabelIndex(collections.abc.Mapping):
+    """The mapping from label to id of a CSRGraph, built on the first lookup."""
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.index = None
+
+    def __getitem__(self, label):
+        if self.index is None:
+            labels = self.labels.list() if isinstance(self.labels, LabelTable) else self.labels
+            self.index = {label: i for i, label in enumerate(labels)}
+        return self.index[label]
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+
+class CoordinateView(collections.abc.Mapping):
+    """The locations of a CSRGraph, read from its coords array."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, node):
+        try:
+            return tuple(self.graph.coords[self.graph.id(node)].tolist())
+        except (IndexError, TypeError):
+            raise KeyError(node)
+
+    def __iter__(self):
+        return iter(self.graph.nodes())
+
+    def __len__(self):
+        return len(self.graph.coords)
+
+
 def RandomGraph(nodes=list(range(10)), min_links=2, width=400, height=300,
-                curvature=lambda: random.uniform(1.1, 1.5)):
+                curvature=lambda: random.uniform(1.1, 1.5), spatial_index=False):
     """Construct a random graph, with the specified nodes, and random links.
     The nodes are laid out randomly on a (width x height) rectangle.
     Then each node is connected to the min_links nearest neighbors.
     Because inverse links are added, some nodes will have more connections.
     The distance between nodes is the hypotenuse times curvature(),
-    where curvature() defaults to a random number between 1.1 and 1.5."""
+    where curvature() defaults to a random number between 1.1 and 1.5.
+    With spatial_index=True, nearest neighbors are found in a grid of cells
+    holding about four nodes each, searching rings of cells outwards, rather
+    than by scanning every node: construction goes from O(n^2) to about
+    O(n), so a million nodes take seconds instead of days. The random calls
+    and the tie-breaking (the first node in nodes) are the same, so the
+    graph for a given seed is too."""
     g = UndirectedGraph()
     g.locations = {}
     # Build the cities
     for node in nodes:
         g.locations[node] = (random.randrange(width), random.randrange(height))
+    if spatial_index:
+        nodes = list(nodes)
+        position = {node: i for i, node in enumerate(nodes)}
+        size = max(1.0, np.sqrt(width * height * 4 / max(len(nodes), 1)))
+        points = [g.locations[node] for node in nodes]
+        candidates = _nearest_candidates(points, size, min_links)
+        cells = None
+
+        def ring(r):
+            """The offsets of the cells r cells away from a cell."""
+            if r == 0:
+                return [(0, 0)]
+            return ([(dx, dy) for dx in range(-r, r + 1) for dy in (-r, r)] +
+                    [(dx, dy) for dx in (-r, r) for dy in range(-r + 1, r)])
+
+        def nearest_neighbor(node, here):
+            """The first of the nearest nodes not yet linked to node: one of its
+            precomputed candidates, if any is unlinked, else searched ring by
+            ring, until no node outside the rings searched can be as near."""
+            links = g.graph_dict.get(node, {})
+            for i in candidates[position[node]] or ():
+                n = nodes[i]
+                if n is not node and not links.get(n):
+                    return n
+            nonlocal cells
+            if cells is None:
+                cells = collections.defaultdict(list)
+                for i, (px, py) in enumerate(points):
+                    cells[px // size, py // size].append(i)
+            x, y = here
+            cx, cy = x // size, y // size
+            # the distance from here to the edges of its own cell
+            margin = min(x - cx * size, (cx + 1) * size - x, y - cy * size, (cy + 1) * size - y)
+            best, best_i = np.inf, None
+            for r in range(int(max(width, height) // size) + 2):
+                for dx, dy in ring(r):
+                    for i in cells.get((cx + dx, cy + dy), ()):
+                        n = nodes[i]
+                        if n is node or links.get(n):
+                            continue
+                        px, py = points[i]
+                        d = (px - x) ** 2 + (py - y) ** 2
+                        if d < best or (d == best and i < best_i):
+                            best, best_i = d, i
+                if best < (r * size + margin) ** 2:
+                    break
+            return nodes[best_i] if best_i is not None else nodes[0]
+
     # Build roads from each city to at least min_links nearest neighbors.
     for i in range(min_links):
         for node in nodes:
@@ -1090,12 +2077,68 @@ def RandomGraph(nodes=list(range(10)), min_links=2, width=400, height=300,
                         return np.inf
                     return distance(g.locations[n], here)
 
-                neighbor = min(nodes, key=distance_to_node)
+                if spatial_index:
+                    neighbor = nearest_neighbor(node, here)
+                else:
+                    neighbor = min(nodes, key=distance_to_node)
                 d = distance(g.locations[neighbor], here) * curvature()
                 g.connect(node, neighbor, int(d))
     return g
 
 
+def _nearest_candidates(points, size, k, reach=1, chunk=16384, max_per_cell=16):
+    """For each (x, y) point with integer coordinates, the indices of its k
+    nearest other points, ordered by distance and then index, found with
+    NumPy among the (2 * reach + 1)^2 grid cells of side size around it; or
+    None for points whose k nearest may lie outside those cells (or in a cell
+    holding more than max_per_cell points), to be searched for another way."""
+    n = len(points)
+    xy = np.array(points, dtype=np.int64).reshape(-1, 2)
+    if n < 2 or k < 1 or n * 2 * int(np.abs(xy).max() + 1) ** 2 * 4 >= 2 ** 62:
+        return [None] * n
+    cell = np.floor_divide(xy.astype(float), size)
+    # the distance from each point to the edges of its own cell
+    low = xy - cell * size
+    margin = np.minimum(low, size - low).min(axis=1)
+    cell = (cell - cell.min(axis=0)).astype(np.int64)
+    gx, gy = cell.max(axis=0) + 1
+    cell_id = cell[:, 0] * gy + cell[:, 1]
+    counts = np.bincount(cell_id, minlength=gx * gy)
+    per_cell = int(min(counts.max(), max_per_cell))
+    if k >= (2 * reach + 1) ** 2 * per_cell:
+        return [None] * n
+    # table[c] lists the points in cell c (padded with -1); the extra last row
+    # stands for the cells off the grid; full[c] marks the overflowing cells
+    order = np.argsort(cell_id, kind='stable')
+    slot = np.arange(n) - np.concatenate([[0], np.cumsum(counts)])[cell_id[order]]
+    table = np.full((gx * gy + 1, per_cell), -1, dtype=np.int64)
+    kept = slot < per_cell
+    table[cell_id[order][kept], slot[kept]] = order[kept]
+    full = np.append(counts > per_cell, False)
+    x, y = xy[:, 0].copy(), xy[:, 1].copy()
+    offsets = [(dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)]
+    result = []
+    for start in range(0, n, chunk):
+        idx = np.arange(start, min(start + chunk, n))
+        cx, cy = cell[idx, 0], cell[idx, 1]
+        ids = []
+        for dx, dy in offsets:
+            nx, ny = cx + dx, cy + dy
+            ids.append(np.where((nx >= 0) & (nx < gx) & (ny >= 0) & (ny < gy), nx * gy + ny, gx * gy))
+        ids = np.stack(ids, axis=1)
+        near = table[ids].reshape(len(idx), -1)
+        dx, dy = x[near] - x[idx, None], y[near] - y[idx, None]
+        d = dx * dx + dy * dy
+        key = np.where((near < 0) | (near == idx[:, None]), np.iinfo(np.int64).max, d * n + near)
+        best = np.sort(np.partition(key, k - 1, axis=1)[:, :k], axis=1)
+        kth = best[:, -1] // n
+        exact = ~full[ids].any(axis=1) & (best[:, -1] < np.iinfo(np.int64).max)
+        exact &= kth < (reach * size + margin[idx]) ** 2
+        for row, ok in zip((best % n).tolist(), exact.tolist()):
+            result.append(row if ok else None)
+    return result
+
+
 """ [Figure 3.2]
 Simplified road map of Romania
 """
@@ -1179,15 +2222,284 @@ australia_map.locations = dict(WA=(120, 24), NT=(135, 20), SA=(135, 30),
                                V=(145, 37))
 
 
+class Landmarks:
+    """Landmark tables for the ALT (A*, landmarks, triangle inequality)
+    heuristic on a Graph or CSRGraph. k landmark nodes are chosen, each as
+    far as possible from those before it, and a Dijkstra search from each
+    records its distance to every node (and, for directed graphs, a search
+    on the reversed links records every node's distance to it). Then, by the
+    triangle inequality, for any landmark L the distance from a to b is at
+    least d(L, b) - d(L, a) and d(a, L) - d(b, L); h(a, b) is the largest of
+    these bounds, an admissible and consistent heuristic that needs no
+    locations. The tables are (k, n) arrays, float32 when that holds the
+    distances exactly; save and load keep them on disk for reuse."""
+
+    def __init__(self, graph=None, k=8, landmarks=None):
+        self.labels, self.index, self.landmarks, self.tables, self.reverse_tables = [], {}, [], None, None
+        if graph is None:
+            return
+        self.labels = graph.nodes()
+        self.index = {node: i for i, node in enumerate(self.labels)}
+        adjacency = [[] for _ in self.labels]
+        reverse = [[] for _ in self.labels]
+        for i, node in enumerate(self.labels):
+            for neighbor, d in graph.get(node).items():
+                adjacency[i].append((self.index[neighbor], d))
+                reverse[self.index[neighbor]].append((i, d))
+        if landmarks is None:
+            landmarks = [self.labels[i] for i in self.farthest_landmarks(adjacency, k)]
+        self.landmarks = list(landmarks)
+        tables = [dijkstra_distances(adjacency, self.index[landmark]) for landmark in self.landmarks]
+        self.tables = self.compact(tables)
+        if graph.directed:
+            self.reverse_tables = self.compact([dijkstra_distances(reverse, self.index[landmark])
+                                                for landmark in self.landmarks])
+
+    @staticmethod
+    def farthest_landmarks(adjacency, k):
+        """Choose k node ids, starting with the farthest from node 0, then
+        each time the node farthest from all the landmarks so far (or, once
+        they reach no other node, one that they can't reach, to cover
+        another component)."""
+        if not adjacency:
+            return []
+        nearest = dijkstra_distances(adjacency, 0)
+        nearest[0] = -1  # so that node 0 is picked only if alone
+        chosen = []
+        for _ in range(min(k, len(adjacency))):
+            reached = np.where(np.isfinite(nearest), nearest, -1)
+            i = int(np.argmax(reached if reached.max() > 0 else nearest))
+            chosen.append(i)
+            nearest = np.minimum(nearest, dijkstra_distances(adjacency, i))
+            nearest[chosen] = -1
+        return chosen
+
+    @staticmethod
+    def compact(tables):
+        """Stack distance tables into a float32 array if that is exact, else float64."""
+        tables = np.array(tables, dtype=float).reshape(len(tables), -1)
+        finite = tables[np.isfinite(tables)]
+        if np.all(finite == np.round(finite)) and (not finite.size or finite.max() < 2 ** 24):
+            return tables.astype(np.float32)
+        return tables
+
+    def h(self, a, b):
+        """A lower bound on the distance from node a to node b."""
+        if self.index is None:  # the nodes are their ids
+            i, j = a, b
+        else:
+            i, j = self.index.get(a), self.index.get(b)
+        if i is None or j is None or self.tables is None or not len(self.tables):
+            return 0
+        reverse = self.tables if self.reverse_tables is None else self.reverse_tables  # undirected: d(a, L) = d(L, a)
+        return max(triangle_bound(self.tables[:, i], self.tables[:, j]),
+                   triangle_bound(reverse[:, j], reverse[:, i]))
+
+    def save(self, filename):
+        """Save the tables to an .npz file; the labels and landmarks (which
+        must be JSON strings, numbers or tuples of them) are stored as JSON
+        text, so the file loads without pickle."""
+        import json
+        labels = self.labels
+        if labels is not None:
+            labels = labels.list() if isinstance(labels, LabelTable) else list(labels)
+        text = json.dumps(dict(labels=labels, landmarks=list(self.landmarks))).encode()
+        np.savez(filename, names=np.frombuffer(text, dtype=np.uint8), tables=self.tables,
+                 reverse_tables=self.reverse_tables if self.reverse_tables is not None else np.zeros(0))
+
+    @classmethod
+    def load(cls, filename):
+        """Load tables saved by save (on the same graph)."""
+        import json
+        with np.load(filename, allow_pickle=False) as data:
+            names = json.loads(data['names'].tobytes())
+            landmarks = cls()
+            landmarks.labels = (None if names['labels'] is None else
+                                [_label_from_json(node) for node in names['labels']])
+            landmarks.index = ({node: i for i, node in enumerate(landmarks.labels)}
+                               if landmarks.labels is not None else None)
+            landmarks.landmarks = [_label_from_json(node) for node in names['landmarks']]
+            landmarks.tables = data['tables']
+            landmarks.reverse_tables = data['reverse_tables'] if data['reverse_tables'].size else None
+        return landmarks
+
+
+def dijkstra_distances(adjacency, source):
+    """The distances from node id source to every node id, as an array (np.inf
+    where unreachable), given adjacency[i], the (id, distance) links of i."""
+    dist = [np.inf] * len(adjacency)
+    dist[source] = 0
+    frontier = [(0, source)]
+    while frontier:
+        d, i = heapq.heappop(frontier)
+        if d > dist[i]:
+            continue
+        for j, w in adjacency[i]:
+            if d + w < dist[j]:
+                dist[j] = d + w
+                heapq.heappush(frontier, (d + w, j))
+    return np.array(dist, dtype=float)
+
+
+def triangle_bound(to_a, to_b):
+    """The largest to_b - to_a over the landmarks, where to_a and to_b hold
+    each landmark's distance to a and to b: a lower bound on the distance
+    from a to b. It is np.inf if a landmark reaches a but not b, in which
+    case a cannot reach b either."""
+    reached = np.isfinite(to_a)
+    if np.any(reached & ~np.isfinite(to_b)):
+        return np.inf
+    both = reached & np.isfinite(to_b)
+    return max(0, (to_b[both] - to_a[both]).max(initial=0).item())
+
+
+class ContractionHierarchy:
+    """A contraction hierarchy for fast repeated shortest-path queries on a
+    fixed Graph (or CSRGraph). Preprocessing contracts the nodes one by one,
+    in order of importance (edge difference plus contracted neighbors,
+    updated lazily): a node is removed, and a shortcut u -> w of length
+    d(u, v) + d(v, w) is added in its place for each path u -> v -> w that a
+    bounded witness search finds no shorter way around. A query is then a
+    bidirectional Dijkstra search that only goes up the hierarchy (to nodes
+    contracted later), settling a few hundred nodes even on large graphs;
+    shortcuts are unpacked into the original links, and the result is a
+    chain of Nodes just as a search of GraphProblem(start, goal, graph)
+    would return. Queries are exact; the witness searches settle at most
+    witness_limit nodes, which only costs extra shortcuts."""
+
+    def __init__(self, graph, witness_limit=50):
+        out = {node: {} for node in graph.nodes()}
+        into = {node: {} for node in out}
+        for a in out:
+            for b, d in graph.get(a).items():
+                if a != b:
+                    out[a][b] = into[b][a] = (d, None)
+        self.witness_limit = witness_limit
+        self.rank = {}
+        # up[v] and down[v] hold the links v -> x and x -> v (with the node a
+        # shortcut stands for, or None) of each x contracted after v
+        self.up, self.down = {}, {}
+        self.shortcuts = 0
+        contracted = collections.Counter()
+        queue = [(self.importance(v, out, into, contracted), i, v) for i, v in enumerate(out)]
+        heapq.heapify(queue)
+        while queue:
+            _, i, v = heapq.heappop(queue)
+            priority = self.importance(v, out, into, contracted)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, i, v))
+                continue
+            for u, w, d in self.shortcuts_for(v, out, into):
+                if w not in out[u] or d < out[u][w][0]:
+                    self.shortcuts += w not in out[u]
+                    out[u][w] = into[w][u] = (d, v)
+            self.rank[v] = len(self.rank)
+            self.up[v], self.down[v] = out.pop(v), into.pop(v)
+            for x in self.up[v]:
+                del into[x][v]
+                contracted[x] += 1
+            for x in self.down[v]:
+                del out[x][v]
+                contracted[x] += 1
+
+    def shortcuts_for(self, v, out, into):
+        """The shortcuts (u, w, distance) needed if v were contracted."""
+        shortcuts = []
+        targets = {w: dw for w, (dw, _) in out[v].items()}
+        if not targets:
+            return shortcuts
+        longest = max(targets.values())
+        for u, (du, _) in into[v].items():
+            # a witness search: the distances from u in the graph without v
+            dist = {u: 0}
+            frontier = [(0, u)]
+            settled = 0
+            while frontier and settled < self.witness_limit:
+                d, x = heapq.heappop(frontier)
+                if d > dist[x]:
+                    continue
+                if d > du + longest:
+                    break
+                settled += 1
+                for y, (dy, _) in out[x].items():
+                    if y != v and d + dy < dist.get(y, np.inf):
+                        dist[y] = d + dy
+                        heapq.heappush(frontier, (d + dy, y))
+            for w, dw in targets.items():
+                if w != u and dist.get(w, np.inf) > du + dw:
+                    shortcuts.append((u, w, du + dw))
+        return shortcuts
+
+    def importance(self, v, out, into, contracted):
+        """The edge difference of contracting v, plus its contracted neighbors."""
+        return len(self.shortcuts_for(v, out, into)) - len(out[v]) - len(into[v]) + contracted[v]
+
+    def search(self, start, goal):
+        """The shortest path from start to goal, as the goal Node of a chain
+        (so solution() and path() work), or None if there is none."""
+        dist = [{start: 0}, {goal: 0}]
+        prev = [{start: None}, {goal: None}]
+        frontiers = [[(0, start)], [(0, goal)]]
+        links = [self.up, self.down]
+        best, meeting = np.inf, None
+        while any(frontier and frontier[0][0] < best for frontier in frontiers):
+            side = 0 if frontiers[0] and (not frontiers[1] or frontiers[0][0] <= frontiers[1][0]) else 1
+            d, x = heapq.heappop(frontiers[side])
+            if d > dist[side][x] or d >= best:
+                continue
+            if x in dist[1 - side] and d + dist[1 - side][x] < best:
+                best, meeting = d + dist[1 - side][x], x
+            for y, (dy, _) in links[side][x].items():
+                if d + dy < dist[side].get(y, np.inf):
+                    dist[side][y] = d + dy
+                    prev[side][y] = x
+                    heapq.heappush(frontiers[side], (d + dy, y))
+        if meeting is None:
+            return None
+        # the path is start ... meeting (going up) then meeting ... goal
+        path = [meeting]
+        while prev[0][path[0]] is not None:
+            path.insert(0, prev[0][path[0]])
+        while prev[1][path[-1]] is not None:
+            path.append(prev[1][path[-1]])
+        node = Node(start)
+        for a, b in zip(path, path[1:]):
+            for x, y, d in self.unpack(a, b):
+                node = Node(y, node, y, node.path_cost + d)
+        return node
+
+    def link(self, a, b):
+        """The (distance, shortcut node or None) of the link a -> b."""
+        return self.up[a][b] if self.rank[a] < self.rank[b] else self.down[b][a]
+
+    def unpack(self, a, b):
+        """The original links (x, y, distance) that the link a -> b stands for."""
+        stack, links = [(a, b)], []
+        while stack:
+            x, y = stack.pop()
+            d, v = self.link(x, y)
+            if v is None:
+                links.append((x, y, d))
+            else:
+                stack.extend([(v, y), (x, v)])
+        return links
+
+
 class GraphProblem(Problem):
-    """The problem of searching a graph from one node to another."""
+    """The problem of searching a graph from one node to another.
+    If landmarks (a Landmarks for the graph) are given, h also uses the ALT
+    bound, which works without, or with misleading, locations. By default,
+    they are those of the graph (as loaded by CSRGraph.load), if any."""
 
-    def __init__(self, initial, goal, graph):
+    def __init__(self, initial, goal, graph, landmarks=None):
         super().__init__(initial, goal)
         self.graph = graph
+        self.landmarks = landmarks if landmarks is not None else getattr(graph, 'landmarks', None)
 
     def actions(self, A):
         """The actions at a graph node are just its neighbors."""
+        if isinstance(self.graph, CSRGraph):
+            return self.graph.neighbors(A)
         return list(self.graph.get(A).keys())
 
     def result(self, state, action):
@@ -1200,20 +2512,24 @@ class GraphProblem(Problem):
     def find_min_edge(self):
         """Find minimum value of edges."""
         m = np.inf
+        if isinstance(self.graph, CSRGraph):
+            return self.graph.weights.min().item() if len(self.graph.weights) else m
         for d in self.graph.graph_dict.values():
-            local_min = min(d.values())
-            m = min(m, local_min)
+            if d:
+                m = min(m, min(d.values()))
 
         return m
 
     def h(self, node):
-        """h function is straight-line distance from a node's state to goal."""
+        """h function is straight-line distance from a node's state to goal,
+        or the landmark bound, if larger."""
         locs = getattr(self.graph, 'locations', None)
+        state = node.state if isinstance(node, Node) else node
+        if self.landmarks is not None:
+            bound = self.landmarks.h(state, self.goal)
+            return max(bound, int(distance(locs[state], locs[self.goal]))) if locs else bound
         if locs:
-            if type(node) is str:
-                return int(distance(locs[node], locs[self.goal]))
-
-            return int(distance(locs[node.state], locs[self.goal]))
+            return int(distance(locs[state], locs[self.goal]))
         else:
             return np.inf
 
@@ -1234,6 +2550,179 @@ class GraphProblemStochastic(GraphProblem):
         raise NotImplementedError
 
 
+class RoutingService:
+    """A long-lived service answering shortest-path queries on one graph,
+    in process (query) or to clients of a Unix socket (serve), one JSON
+    object per line each way: {"source": a, "target": b} gets back
+    {"source": a, "target": b, "path": [a, ..., b], "cost": c} ("path" and
+    "cost" are null if b can't be reached); a bad request, or one with a node
+    not in the graph, gets {"error": message}. An "id", if sent, is echoed in
+    either reply. Each query is answered from, in order of preference:
+    - an LRU cache of the last cache_size results;
+    - a cached shortest-path tree of its source, built (by a full Dijkstra
+      search) for the tree_cache_size sources most recently queried again
+      among the last cache_size sources, since a repeated source is likely
+      to come again;
+    - a search of the graph: hierarchy.search if a ContractionHierarchy
+      is given, else astar_search of a GraphProblem (with landmarks, if
+      given).
+    The latency of each query is counted in a histogram for its kind
+    ('cache', 'tree' or 'search'), in power-of-two buckets of microseconds;
+    histograms() returns them."""
+
+    def __init__(self, graph, hierarchy=None, landmarks=None, cache_size=10000, tree_cache_size=64):
+        self.graph = graph
+        self.nodes = set(graph.nodes())
+        self.hierarchy = hierarchy
+        self.landmarks = landmarks
+        self.cache_size = cache_size
+        self.tree_cache_size = tree_cache_size
+        self.results = collections.OrderedDict()  # (source, target) -> (path, cost)
+        self.trees = collections.OrderedDict()  # source -> (distances, predecessors)
+        self.sources = collections.OrderedDict()  # the last cache_size sources queried
+        self.latencies = collections.defaultdict(collections.Counter)
+
+    def query(self, source, target):
+        """Return (path, cost) for the shortest path from source to target,
+        where path is the list of nodes; or (None, None) if there is none.
+        Raise KeyError if source or target is not a node of the graph."""
+        start = time.perf_counter()
+        for node in (source, target):
+            if node not in self.nodes:
+                raise KeyError(node)
+        key = (source, target)
+        if key in self.results:
+            self.results.move_to_end(key)
+            kind, result = 'cache', self.results[key]
+        else:
+            repeated = source in self.sources
+            self.sources[source] = True
+            self.sources.move_to_end(source)
+            if len(self.sources) > self.cache_size:
+                self.sources.popitem(last=False)
+            if source in self.trees or repeated:
+                kind, result = 'tree', self.tree_path(source, target)
+            else:
+                kind, result = 'search', self.search(source, target)
+            self.results[key] = result
+            if len(self.results) > self.cache_size:
+                self.results.popitem(last=False)
+        elapsed = int((time.perf_counter() - start) * 1e6)
+        self.latencies[kind][2 ** elapsed.bit_length()] += 1
+        return result
+
+    def search(self, source, target):
+        """Search the graph for the (path, cost) from source to target."""
+        if self.hierarchy is not None:
+            node = self.hierarchy.search(source, target)
+        else:
+            node = astar_search(GraphProblem(source, target, self.graph, self.landmarks))
+        if node is None:
+            return None, None
+        return [source] + node.solution(), node.path_cost
+
+    def tree(self, source):
+        """The (distances, predecessors) of the shortest-path tree of source."""
+        if source in self.trees:
+            self.trees.move_to_end(source)
+            return self.trees[source]
+        distances, predecessors = {source: 0}, {source: None}
+        frontier = [(0, 0, source)]
+        pushed = 0  # entries are (distance, order pushed, node): nodes are never compared
+        while frontier:
+            d, _, a = heapq.heappop(frontier)
+            if d > distances[a]:
+                continue
+            for b, dab in self.graph.get(a).items():
+                if d + dab < distances.get(b, np.inf):
+                    distances[b], predecessors[b] = d + dab, a
+                    pushed += 1
+                    heapq.heappush(frontier, (d + dab, pushed, b))
+        self.trees[source] = distances, predecessors
+        if len(self.trees) > self.tree_cache_size:
+            self.trees.popitem(last=False)
+        return distances, predecessors
+
+    def tree_path(self, source, target):
+        """The (path, cost) from source to target in the tree of source."""
+        distances, predecessors = self.tree(source)
+        if target not in distances:
+            return None, None
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]])
+        return path[::-1], distances[target]
+
+    def histograms(self):
+        """Return {kind: {bucket: count}}, where a bucket counts the queries
+        that took less than that many microseconds (and at least half)."""
+        return {kind: dict(sorted(counts.items())) for kind, counts in self.latencies.items()}
+
+    async def handle(self, reader, writer):
+        """Answer the queries of one client connection, until it closes."""
+        import json
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    path, cost = self.query(request['source'], request['target'])
+                    response = dict(source=request['source'], target=request['target'],
+                                    path=None if path is None else [json_value(node) for node in path],
+                                    cost=json_value(cost))
+                except (ValueError, KeyError, TypeError) as e:
+                    response = dict(error='{}: {}'.format(type(e).__name__, e))
+                if isinstance(request, dict) and 'id' in request:
+                    response['id'] = request['id']
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, path):
+        """Start serving on the Unix socket at path, and return the
+        asyncio server (close it, or use it as a context, to stop)."""
+        import asyncio
+        if os.path.exists(path):
+            os.unlink(path)
+        return await asyncio.start_unix_server(self.handle, path)
+
+    def serve(self, path):
+        """Serve on the Unix socket at path until interrupted."""
+        import asyncio
+
+        async def main():
+            async with await self.start(path) as server:
+                await server.serve_forever()
+
+        asyncio.run(main())
+
+
+def json_value(x):
+    """x as a plain Python value (a NumPy scalar as its int or float)."""
+    return x.item() if isinstance(x, np.generic) else x
+
+
+async def routing_client(path, queries):
+    """Send (source, target) queries to a RoutingService on the Unix socket at
+    path, all at once, and return their responses (as dicts), in order."""
+    import asyncio
+    import json
+    reader, writer = await asyncio.open_unix_connection(path)
+    for i, (source, target) in enumerate(queries):
+        writer.write(json.dumps(dict(id=i, source=source, target=target)).encode() + b'\n')
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in queries]
+    writer.close()
+    await writer.wait_closed()
+    return sorted(responses, key=lambda response: response.get('id', -1))
+
+
 # ______________________________________________________________________________
 
 
@@ -1296,6 +2785,30 @@ class NQueensProblem(Problem):
 
         return num_conflicts
 
+    def expand_batch(self, state):
+        """Return the (row, state, step cost) of all successors of state. The
+        rows and diagonals under attack are collected once, so each row is
+        checked in constant time instead of against every placed queen."""
+        if state[-1] != -1:
+            return []
+        col = state.index(-1)
+        rows = set(state[:col])
+        downs = {r - c for c, r in enumerate(state[:col])}
+        ups = {r + c for c, r in enumerate(state[:col])}
+        return [(row, state[:col] + (row,) + state[col + 1:], 1) for row in range(self.N)
+                if row not in rows and row - col not in downs and row + col not in ups]
+
+    def h_batch(self, states):
+        """Return the heuristic value of each of the given states (see h),
+        counting the conflicting pairs of all of them with numpy at once."""
+        queens = np.array(states).reshape(len(states), self.N)
+        cols = np.arange(self.N)
+        conflicts = np.zeros((len(states), self.N, self.N), dtype=bool)
+        for line in (queens, cols - queens, cols + queens):
+            conflicts |= line[:, :, None] == line[:, None, :]
+        conflicts &= ~np.eye(self.N, dtype=bool)
+        return conflicts.sum(axis=(1, 2)).tolist()
+
 
 # ______________________________________________________________________________
 # Inverse Boggle: Search for a high-scoring Boggle board. A good domain for
@@ -1517,25 +3030,85 @@ def mutate_boggle(board):
 # Code to compare searchers on various problems.
 
 
-class InstrumentedProblem(Problem):
-    """Delegates to a problem, and keeps statistics."""
+class SearchProgress:
+    """The expansions in each second since start and the branching factor
+    per depth of a search, recorded from its search_progress hook (see
+    best_first_graph_search)."""
 
-    def __init__(self, problem):
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.expansions_per_second = []
+        self.branching = {}  # depth -> [expanded nodes, children, most children]
+
+    def record(self, node, branching):
+        """Count the expansion of node into branching children."""
+        second = int(time.perf_counter() - self.start)
+        while len(self.expansions_per_second) <= second:
+            self.expansions_per_second.append(0)
+        self.expansions_per_second[second] += 1
+        stats = self.branching.setdefault(node.depth, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += branching
+        stats[2] = max(stats[2], branching)
+
+    @property
+    def expansions(self):
+        return sum(self.expansions_per_second)
+
+    def branching_factor(self):
+        """Return {depth: {'nodes': expanded, 'mean': children, 'max': children}}."""
+        return {depth: {'nodes': nodes, 'mean': children / nodes, 'max': most}
+                for depth, (nodes, children, most) in sorted(self.branching.items())}
+
+
+class InstrumentedProblem(Problem):
+    """Delegates to a problem, and keeps statistics.
+    Besides the number of expanded nodes (succs), goal tests and generated
+    states, it records the time spent in each method of the problem, the
+    number of heuristic evaluations (of h, h_* and h_batch, counted per
+    state), duplicate hits (generated states whose key, problem.state_key(state)
+    if the problem defines one and hash(state) otherwise, is one of the keys of
+    the last duplicate_window states generated; only the keys are kept, so it
+    takes bounded and small memory), and, through the search_progress hook
+    (see SearchProgress), the peak frontier size, the expansions in each
+    second and the branching factor per depth.
+    stats() returns all of them (and the peak RSS) as a dict, and to_json and
+    to_csv write them out. Each call costs a couple of clock reads and a dict
+    lookup, so it can be left on."""
+
+    def __init__(self, problem, duplicate_window=100000):
         self.problem = problem
         self.succs = self.goal_tests = self.states = 0
         self.found = None
+        self.h_evals = self.duplicates = self.peak_frontier = 0
+        self.times = collections.defaultdict(float)  # method name -> seconds
+        self.duplicate_window = duplicate_window
+        self.recent = collections.OrderedDict()  # keys of the last duplicate_window generated states
+        self.duplicate_key = getattr(problem, 'state_key', None) or hash
+        self.heuristics = {}  # name -> counted heuristic
+        self.progress = SearchProgress()
+        self.start = self.progress.start
 
     def actions(self, state):
         self.succs += 1
-        return self.problem.actions(state)
+        start = time.perf_counter()
+        actions = self.problem.actions(state)
+        self.times['actions'] += time.perf_counter() - start
+        return actions
 
     def result(self, state, action):
         self.states += 1
-        return self.problem.result(state, action)
+        start = time.perf_counter()
+        result = self.problem.result(state, action)
+        self.times['result'] += time.perf_counter() - start
+        self.generated(result)
+        return result
 
     def goal_test(self, state):
         self.goal_tests += 1
+        start = time.perf_counter()
         result = self.problem.goal_test(state)
+        self.times['goal_test'] += time.perf_counter() - start
         if result:
             self.found = state
         return result
@@ -1544,16 +3117,167 @@ class InstrumentedProblem(Problem):
         return self.problem.path_cost(c, state1, action, state2)
 
     def value(self, state):
-        return self.problem.value(state)
+        start = time.perf_counter()
+        value = self.problem.value(state)
+        self.times['value'] += time.perf_counter() - start
+        return value
+
+    @property
+    def expand_batch(self):
+        """The problem's expand_batch, counted like actions and result, or
+        None if it has none."""
+        if getattr(self.problem, 'expand_batch', None) is None:
+            return None
+        return self._expand_batch
+
+    def _expand_batch(self, state):
+        self.succs += 1
+        start = time.perf_counter()
+        children = self.problem.expand_batch(state)
+        self.times['expand_batch'] += time.perf_counter() - start
+        self.states += len(children)
+        for action, child, cost in children:
+            self.generated(child)
+        return children
+
+    def generated(self, state):
+        try:
+            key = self.duplicate_key(state)
+        except TypeError:  # unhashable states are not checked for duplicates
+            return
+        if key in self.recent:
+            self.duplicates += 1
+            self.recent.move_to_end(key)
+            return
+        self.recent[key] = True
+        if len(self.recent) > self.duplicate_window:
+            self.recent.popitem(last=False)
+
+    def counted_heuristic(self, name, h):
+        """Return h, counting its evaluations and time (h_batch counts one
+        evaluation per state). Integer bounds of h are kept."""
+        def counted(arg):
+            start = time.perf_counter()
+            value = h(arg)
+            self.times[name] += time.perf_counter() - start
+            self.h_evals += len(arg) if name == 'h_batch' else 1
+            return value
+
+        if hasattr(h, 'priority_bounds'):
+            counted.priority_bounds = h.priority_bounds
+        return counted
+
+    def search_progress(self, node, branching, frontier_size):
+        self.peak_frontier = max(self.peak_frontier, frontier_size)
+        self.progress.record(node, branching)
+        progress = getattr(self.problem, 'search_progress', None)
+        if progress:
+            progress(node, branching, frontier_size)
+
+    def stats(self):
+        """Return the statistics as a dict."""
+        elapsed = time.perf_counter() - self.start
+        return {'expanded': self.succs,
+                'goal_tests': self.goal_tests,
+                'generated': self.states,
+                'h_evals': self.h_evals,
+                'duplicates': self.duplicates,
+                'peak_frontier': self.peak_frontier,
+                'peak_rss_mb': peak_rss(),
+                'elapsed_s': elapsed,
+                'expansions_per_second': self.progress.expansions / elapsed if elapsed else 0.0,
+                'method_times_s': dict(self.times),
+                'expansions_per_second_series': list(self.progress.expansions_per_second),
+                'branching_factor': self.progress.branching_factor()}
+
+    def to_json(self, filename):
+        """Write stats() to filename as JSON."""
+        import json
+        with open(filename, 'w') as f:
+            json.dump(self.stats(), f, indent=2)
+
+    def to_csv(self, filename):
+        """Write stats() to filename as CSV rows of (metric, key, value); key
+        is empty for scalar metrics, and is the method, the second or the
+        depth for the nested ones."""
+        import csv
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['metric', 'key', 'value'])
+            for metric, value in self.stats().items():
+                if metric == 'method_times_s':
+                    writer.writerows([metric, method, seconds] for method, seconds in sorted(value.items()))
+                elif metric == 'expansions_per_second_series':
+                    writer.writerows([metric, second, count] for second, count in enumerate(value))
+                elif metric == 'branching_factor':
+                    writer.writerows(['branching_' + field, depth, number]
+                                     for depth, fields in value.items() for field, number in fields.items())
+                else:
+                    writer.writerow([metric, '', value])
 
     def __getattr__(self, attr):
-        return getattr(self.problem, attr)
+        if 'problem' not in self.__dict__:  # not initialized yet (e.g. while being copied)
+            raise AttributeError(attr)
+        value = getattr(self.problem, attr)
+        if attr == 'h' or attr.startswith('h_'):
+            if attr not in self.heuristics:
+                self.heuristics[attr] = self.counted_heuristic(attr, value)
+            return self.heuristics[attr]
+        return value
 
     def __repr__(self):
         return '<{:4d}/{:4d}/{:4d}/{}>'.format(self.succs, self.goal_tests,
                                                self.states, str(self.found)[:4])
 
 
+class SearchLimitExceeded(Exception):
+    """Raised by LimitedProblem when a search runs out of its time, node or memory budget.
+    limit is one of 'time', 'nodes' or 'memory'."""
+
+    def __init__(self, limit, value):
+        super().__init__('{} limit exceeded ({})'.format(limit, value))
+        self.limit = limit
+        self.value = value
+
+
+class LimitedProblem(InstrumentedProblem):
+    """Delegates to a problem, keeps statistics, and stops the search by raising
+    SearchLimitExceeded once it has run for more than max_time seconds, expanded
+    more than max_nodes nodes or reached more than max_rss megabytes of resident
+    memory. Limits set to None are not enforced. The limits are checked every time
+    a node is expanded, so any search algorithm can be bounded this way."""
+
+    def __init__(self, problem, max_time=None, max_nodes=None, max_rss=None):
+        super().__init__(problem)
+        self.max_time = max_time
+        self.max_nodes = max_nodes
+        self.max_rss = max_rss
+        self.limit_start = time.monotonic()
+
+    def actions(self, state):
+        self.check_limits()
+        return super().actions(state)
+
+    def _expand_batch(self, state):
+        self.check_limits()
+        return super()._expand_batch(state)
+
+    def check_limits(self):
+        if self.max_time is not None and time.monotonic() - self.limit_start > self.max_time:
+            raise SearchLimitExceeded('time', time.monotonic() - self.limit_start)
+        if self.max_nodes is not None and self.succs >= self.max_nodes:
+            raise SearchLimitExceeded('nodes', self.succs)
+        if self.max_rss is not None and peak_rss() > self.max_rss:
+            raise SearchLimitExceeded('memory', peak_rss())
+
+
+def peak_rss():
+    """Return the peak resident set size of this process, in megabytes."""
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 if sys.platform != 'darwin' else rss / 1024 ** 2  # KB on Linux, bytes on macOS
+
+
 def compare_searchers(problems, header,
                       searchers=[breadth_first_tree_search,
                                  breadth_first_graph_search,
@@ -1570,6 +3294,194 @@ def compare_searchers(problems, header,
     print_table(table, header)
 
 
+def benchmark_searchers(problems, searchers=(breadth_first_graph_search, depth_first_graph_search,
+                                             astar_search, recursive_best_first_search),
+                        repetitions=5, warmup=1, max_time=None, max_nodes=None, processes=None,
+                        csv_file=None, json_file=None):
+    """A repeatable, parallel version of compare_searchers. problems is a list
+    of (name, problem) pairs; every searcher runs on every problem warmup
+    times (not measured) and then repetitions times, each run on a fresh copy
+    of the problem (so caches kept in a problem don't carry over) and bounded
+    by a LimitedProblem with max_time and max_nodes. Each searcher x problem
+    cell runs in its own worker process of a pool of processes (cpu count by
+    default), so the peak RSS reported is that of the cell alone.
+    Prints the median time and expanded nodes, a 95% confidence interval of
+    the median time (or, with too few runs for one, [min, max] and its actual
+    coverage; see median_ci) and the peak RSS of each cell, and returns the summaries
+    as a list of dicts; csv_file and json_file, if given, get the summaries
+    (the JSON also gets every run, the date and the host, for trend tracking).
+    A run whose searcher raises is recorded with status 'error' and the
+    exception message, instead of stopping the other cells.
+    Searchers and problems must be picklable, so use functools.partial
+    rather than lambdas to set searcher arguments."""
+    import pickle
+    import platform
+    if repetitions < 1:
+        raise ValueError('repetitions must be at least 1, got {}'.format(repetitions))
+    jobs = [(searcher, problem_name, pickle.dumps(problem), repetitions, warmup, max_time, max_nodes)
+            for searcher in searchers for problem_name, problem in problems]
+    ctx = multiprocessing.get_context('fork')
+    with ctx.Pool(processes, maxtasksperchild=1) as pool:
+        cells = pool.map(_benchmark_cell, jobs, chunksize=1)
+    summaries, runs = [], []
+    for cell_runs, rss in cells:
+        runs.extend(cell_runs)
+        solved = [run for run in cell_runs if run['status'] in ('solved', 'failed')]
+        times = [run['time_s'] for run in solved]
+        low, high, coverage = median_ci(times)
+        summaries.append({'searcher': cell_runs[0]['searcher'], 'problem': cell_runs[0]['problem'],
+                          'runs': len(cell_runs), 'completed': len(solved),
+                          'median_time_s': median(times) if times else None,
+                          'ci_low_s': low, 'ci_high_s': high, 'ci_coverage': coverage,
+                          'median_expanded': median([run['expanded'] for run in solved]) if solved else None,
+                          'cost': solved[0]['cost'] if solved else None,
+                          'peak_rss_mb': rss,
+                          'limits_hit': sorted({run['status'] for run in cell_runs} - {'solved', 'failed', 'error'}),
+                          'error': next((run['error'] for run in cell_runs if run['error']), None)})
+    fmt = lambda x, spec: spec.format(x) if x is not None else '-'
+    print_table([[summary['searcher'], summary['problem'], '{}/{}'.format(summary['completed'], summary['runs']),
+                  fmt(summary['median_time_s'], '{:.4f}'),
+                  '[{}, {}] {}'.format(fmt(summary['ci_low_s'], '{:.4f}'), fmt(summary['ci_high_s'], '{:.4f}'),
+                                       fmt(summary['ci_coverage'], '{:.1%}')),
+                  fmt(summary['median_expanded'], '{:g}'), fmt(summary['peak_rss_mb'], '{:.1f}'),
+                  ' '.join(summary['limits_hit']), summary['error'] or ''] for summary in summaries],
+                header=['Searcher', 'Problem', 'Completed', 'Median (s)', 'CI (s) and coverage', 'Expanded',
+                        'Peak RSS (MB)', 'Limits hit', 'Error'])
+    if csv_file:
+        import csv
+        with open(csv_file, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(summaries[0]))
+            writer.writeheader()
+            writer.writerows(dict(summary, limits_hit=' '.join(summary['limits_hit'])) for summary in summaries)
+    if json_file:
+        import datetime
+        import json
+        with open(json_file, 'w') as f:
+            json.dump({'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                       'host': {'platform': platform.platform(), 'python': platform.python_version(),
+                                'cpus': os.cpu_count()},
+                       'settings': {'repetitions': repetitions, 'warmup': warmup,
+                                    'max_time': max_time, 'max_nodes': max_nodes},
+                       'summaries': summaries, 'runs': runs}, f, indent=2)
+    return summaries
+
+
+def searcher_name(searcher):
+    """The name of a searcher, with the arguments of a functools.partial."""
+    if hasattr(searcher, 'func'):
+        arguments = [repr(arg) for arg in searcher.args]
+        arguments += ['{}={!r}'.format(key, value) for key, value in searcher.keywords.items()]
+        return '{}({})'.format(searcher_name(searcher.func), ', '.join(arguments))
+    return name(searcher)
+
+
+def median_ci(values, level=0.95):
+    """A distribution-free confidence interval of the median of values, from
+    their order statistics: (low, high, coverage), the narrowest interval
+    [k-th smallest, k-th largest] whose exact coverage (from the binomial
+    distribution) is at least level. With too few values for that (up to 5
+    for 95%), it is [min, max] with its lower actual coverage.
+    (None, None, None) if values is empty."""
+    if not values:
+        return None, None, None
+    values, n = sorted(values), len(values)
+    coverage = lambda k: 1 - 2 * sum(math.comb(n, i) for i in range(k)) / 2 ** n
+    k = 1
+    while k < (n + 1) // 2 and coverage(k + 1) >= level:
+        k += 1
+    return values[k - 1], values[n - k], coverage(k)
+
+
+def _benchmark_cell(job):
+    """Run one searcher x problem cell of benchmark_searchers in a worker."""
+    import pickle
+    searcher, problem_name, problem, repetitions, warmup, max_time, max_nodes = job
+    runs = []
+    for run in range(-warmup, repetitions):
+        p = LimitedProblem(pickle.loads(problem), max_time, max_nodes)
+        start = time.perf_counter()
+        try:
+            node = searcher(p)
+            status = 'solved' if node is not None else 'failed'
+        except SearchLimitExceeded as error:
+            node, status, message = None, error.limit, None
+        except Exception as error:
+            node, status, message = None, 'error', '{}: {}'.format(type(error).__name__, error)
+        else:
+            message = None
+        elapsed = time.perf_counter() - start
+        if run >= 0:
+            runs.append({'searcher': searcher_name(searcher), 'problem': problem_name, 'run': run,
+                         'status': status, 'time_s': elapsed, 'expanded': p.succs, 'generated': p.states,
+                         'cost': getattr(node, 'path_cost', None), 'error': message})
+    return runs, peak_rss()
+
+
+def benchmark_graph_searches(queens=12, graph_nodes=300000, graph_links=3, seed=0):
+    """Print time and peak frontier size of breadth_first_graph_search and
+    depth_first_graph_search on problems whose frontier grows past 10^5 nodes:
+    NQueensProblem(queens) and a GraphProblem on a random graph where every one
+    of graph_nodes nodes links to graph_links random others (the goal is not in
+    the graph, so the whole graph is searched)."""
+    random.seed(seed)
+    graph = UndirectedGraph({node: {random.randrange(graph_nodes): 1 for _ in range(graph_links)}
+                             for node in range(graph_nodes)})
+    problems = [('NQueensProblem({})'.format(queens), NQueensProblem(queens)),
+                ('GraphProblem({} nodes)'.format(graph_nodes), GraphProblem(0, None, graph))]
+    table = []
+    for searcher in [breadth_first_graph_search, depth_first_graph_search]:
+        for problem_name, problem in problems:
+            p = InstrumentedProblem(problem)
+            start = time.perf_counter()
+            searcher(p)
+            table.append([name(searcher), problem_name, '{:.2f}'.format(time.perf_counter() - start), p.succs,
+                          p.peak_frontier])
+    print_table(table, header=['Searcher', 'Problem', 'Time (s)', 'Expanded', 'Peak frontier'])
+
+
+def benchmark_hda_star(problem=None, workers=(1, 2, 4), h=None):
+    """Print the time of hda_star_search with each number of workers, and its
+    speedup over astar_search, on problem (by default, an EightPuzzle that
+    takes 31 moves to solve)."""
+    problem = problem or EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1))
+    start = time.perf_counter()
+    astar_cost = astar_search(problem, h).path_cost
+    astar_time = time.perf_counter() - start
+    table = [['astar_search', '', '{:.2f}'.format(astar_time), astar_cost, '1.00']]
+    for n in workers:
+        stats = {}
+        start = time.perf_counter()
+        cost = hda_star_search(problem, n, h, stats).path_cost
+        elapsed = time.perf_counter() - start
+        table.append(['hda_star_search', n, '{:.2f}'.format(elapsed), cost,
+                      '{:.2f}'.format(astar_time / elapsed)])
+    print_table(table, header=['Searcher', 'Workers', 'Time (s)', 'Cost', 'Speedup'])
+
+
+def benchmark_contraction_hierarchy(nodes=5000, min_links=4, queries=100, seed=0):
+    """Print the preprocessing time of a ContractionHierarchy on a RandomGraph
+    of the given size, and the mean time per query of it and of astar_search,
+    on random pairs of nodes (checking that the costs agree)."""
+    random.seed(seed)
+    graph = RandomGraph(list(range(nodes)), min_links, width=40 * int(np.sqrt(nodes)),
+                        height=30 * int(np.sqrt(nodes)), spatial_index=True)
+    start = time.perf_counter()
+    hierarchy = ContractionHierarchy(graph)
+    preprocessing = time.perf_counter() - start
+    pairs = [(random.randrange(nodes), random.randrange(nodes)) for _ in range(queries)]
+    table = []
+    costs = {}
+    for searcher_name, search in [('astar_search', lambda a, b: astar_search(GraphProblem(a, b, graph))),
+                                  ('ContractionHierarchy.search', hierarchy.search)]:
+        start = time.perf_counter()
+        costs[searcher_name] = [getattr(search(a, b), 'path_cost', None) for a, b in pairs]
+        elapsed = (time.perf_counter() - start) / queries
+        table.append([searcher_name, '{:.3f}'.format(elapsed * 1000)])
+    assert costs['astar_search'] == costs['ContractionHierarchy.search']
+    print('Preprocessing: {:.2f} s, {} shortcuts'.format(preprocessing, hierarchy.shortcuts))
+    print_table(table, header=['Searcher', 'Time per query (ms)'])
+
+
 def compare_graph_searchers():
     """Prints a table of search results."""
     compare_searchers(problems=[GraphProblem('Arad', 'Bucharest', romania_map),
@@ -422,9 +422,22 @@ def memoize(fn, slot=None, maxsize=32):
         def memoized_fn(*args):
             return fn(*args)
 
+    if hasattr(fn, 'priority_bounds'):
+        memoized_fn.priority_bounds = fn.priority_bounds
     return memoized_fn
 
 
+def integer_bounds(lo, hi):
+    """Decorator declaring that fn always returns an integer in [lo, hi].
+    Searches use this to store their frontier in a BucketQueue."""
+
+    def decorator(fn):
+        fn.priority_bounds = (lo, hi)
+        return fn
+
+    return decorator
+
+
 def name(obj):
     """Try to find some reasonable name for the object."""
     return (getattr(obj, 'name', 0) or getattr(obj, '__name__', 0) or
@@ -724,20 +737,48 @@ class PriorityQueue:
     order) is returned first.
     If order is 'min', the item with minimum f(x) is
     returned first; if order is 'max', then it is the item with maximum f(x).
-    Also supports dict-like lookup."""
-
-    def __init__(self, order='min', f=lambda x: x):
+    Also supports dict-like lookup.
+    Items are indexed by a dict, so they must be hashable; membership and lookup
+    are O(1). Deleted entries stay in the heap as tombstones and are skipped when
+    popped, so deleting an item and re-inserting it with a better priority
+    (decrease-key) is O(log n). Appending an item that is already queued replaces
+    its previous entry (leaving a tombstone too). Once tombstones outnumber the
+    live entries, the heap is rebuilt without them, so its size stays O(len).
+    Heap entries are [f(x), tiebreak key, seq, x], so items themselves are never
+    compared. tiebreak decides the order among items with equal f(x): 'fifo'
+    (insertion order), 'lifo' (newest first), or a function of the item whose
+    lowest value is popped first (then in insertion order)."""
+
+    def __init__(self, order='min', f=lambda x: x, tiebreak='fifo'):
         self.heap = []
+        self.entries = {}  # item -> its live heap entry [f(item), key, seq, item]
+        self.seq = 0
         if order == 'min':
             self.f = f
         elif order == 'max':  # now item with max f(x)
             self.f = lambda x: -f(x)  # will be popped first
         else:
             raise ValueError("Order must be either 'min' or 'max'.")
+        if tiebreak == 'fifo':
+            self.key, self.step = None, 1
+        elif tiebreak == 'lifo':
+            self.key, self.step = None, -1
+        elif callable(tiebreak):
+            self.key, self.step = tiebreak, 1
+        else:
+            raise ValueError("Tiebreak must be 'fifo', 'lifo' or a function.")
 
     def append(self, item):
         """Insert item at its correct position."""
-        heapq.heappush(self.heap, (self.f(item), item))
+        replaced = item in self.entries
+        if replaced:
+            self.entries[item][3] = _removed
+        entry = [self.f(item), self.key(item) if self.key else 0, self.seq, item]
+        self.seq += self.step
+        self.entries[item] = entry
+        heapq.heappush(self.heap, entry)
+        if replaced:
+            self.compact()
 
     def extend(self, items):
         """Insert each item in items at its correct position."""
@@ -747,34 +788,228 @@ class PriorityQueue:
     def pop(self):
         """Pop and return the item (with min or max f(x) value)
         depending on the order."""
-        if self.heap:
-            return heapq.heappop(self.heap)[1]
-        else:
-            raise Exception('Trying to pop from empty PriorityQueue.')
+        while self.heap:
+            item = heapq.heappop(self.heap)[3]
+            if item is not _removed:
+                del self.entries[item]
+                return item
+        raise Exception('Trying to pop from empty PriorityQueue.')
+
+    def peek(self):
+        """Return the item that pop would return, without removing it."""
+        while self.heap:
+            if self.heap[0][3] is not _removed:
+                return self.heap[0][3]
+            heapq.heappop(self.heap)
+        raise Exception('Trying to peek into empty PriorityQueue.')
 
     def __len__(self):
         """Return current capacity of PriorityQueue."""
-        return len(self.heap)
+        return len(self.entries)
 
     def __contains__(self, key):
         """Return True if the key is in PriorityQueue."""
-        return any([item == key for _, item in self.heap])
+        return key in self.entries
 
     def __getitem__(self, key):
         """Returns the first value associated with key in PriorityQueue.
         Raises KeyError if key is not present."""
-        for value, item in self.heap:
-            if item == key:
-                return value
-        raise KeyError(str(key) + " is not in the priority queue")
+        try:
+            return self.entries[key][0]
+        except KeyError:
+            raise KeyError(str(key) + " is not in the priority queue")
 
     def __delitem__(self, key):
         """Delete the first occurrence of key."""
         try:
-            del self.heap[[item == key for _, item in self.heap].index(True)]
-        except ValueError:
+            entry = self.entries.pop(key)
+        except KeyError:
             raise KeyError(str(key) + " is not in the priority queue")
+        entry[3] = _removed
+        self.compact()
+
+    def compact(self):
+        """Drop the tombstones from the heap if they outnumber the live entries
+        (plus a margin), so that the heap doesn't grow without bound; O(n),
+        amortized O(1) over the deletions and replacements that made them."""
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [entry for entry in self.heap if entry[3] is not _removed]
+            heapq.heapify(self.heap)
+
+    def truncate(self, n):
+        """Keep only the n items that would be popped first and drop the rest.
+        Takes O(len(self) log n); used to cap the frontier of beam search."""
+        if len(self.entries) <= n:
+            return
+        self.heap = heapq.nsmallest(n, (entry for entry in self.heap if entry[3] is not _removed))
         heapq.heapify(self.heap)
+        self.entries = {entry[3]: entry for entry in self.heap}
+
+
+_removed = object()  # marks a deleted PriorityQueue entry
+
+
+class BucketQueue:
+    """A queue with the same interface as PriorityQueue, for integer priorities
+    known to lie within bounds = (lo, hi). There is one bucket per priority
+    value, so append is O(1) and pop is O(1) amortized when the minimum
+    priority moves monotonically (as in A* with a consistent heuristic).
+    tiebreak decides which item of the lowest bucket is popped first:
+    'fifo' (oldest) or 'lifo' (newest). Priorities outside the bounds or
+    not integral raise ValueError. Deleted and replaced entries are left in
+    their buckets as tombstones, which are dropped once they outnumber the
+    live entries, as in PriorityQueue."""
+
+    def __init__(self, order='min', f=lambda x: x, bounds=(0, 100), tiebreak='fifo'):
+        lo, hi = bounds
+        if order == 'min':
+            self.f = f
+        elif order == 'max':  # now item with max f(x)
+            self.f = lambda x: -f(x)  # will be popped first
+            lo, hi = -hi, -lo
+        else:
+            raise ValueError("Order must be either 'min' or 'max'.")
+        if tiebreak not in ('fifo', 'lifo'):
+            raise ValueError("Tiebreak must be either 'fifo' or 'lifo'.")
+        self.lifo = tiebreak == 'lifo'
+        self.lo = lo
+        self.buckets = [collections.deque() for _ in range(hi - lo + 1)]
+        self.entries = {}  # item -> its live bucket entry [f(item), item]
+        self.removed = 0  # tombstones still in the buckets
+        self.min = len(self.buckets)  # no bucket below this index holds a live entry
+
+    def append(self, item):
+        """Insert item in the bucket of its priority."""
+        priority = self.f(item)
+        index = int(priority) - self.lo
+        if index != priority - self.lo or not 0 <= index < len(self.buckets):
+            raise ValueError('Priority {} is not an integer in [{}, {}].'.format(
+                priority, self.lo, self.lo + len(self.buckets) - 1))
+        replaced = item in self.entries
+        if replaced:
+            self.entries[item][1] = _removed
+            self.removed += 1
+        entry = [priority, item]
+        self.entries[item] = entry
+        self.buckets[index].append(entry)
+        self.min = min(self.min, index)
+        if replaced:
+            self.compact()
+
+    def extend(self, items):
+        """Insert each item in items in the bucket of its priority."""
+        for item in items:
+            self.append(item)
+
+    def pop(self):
+        """Pop and return the item with min f(x) (or max f(x), depending on
+        the order), breaking ties according to tiebreak."""
+        while self.entries:
+            bucket = self.buckets[self.min]
+            while bucket:
+                item = (bucket.pop() if self.lifo else bucket.popleft())[1]
+                if item is not _removed:
+                    del self.entries[item]
+                    return item
+                self.removed -= 1
+            self.min += 1
+        raise Exception('Trying to pop from empty BucketQueue.')
+
+    def peek(self):
+        """Return the item that pop would return, without removing it."""
+        while self.entries:
+            bucket = self.buckets[self.min]
+            while bucket:
+                entry = bucket[-1] if self.lifo else bucket[0]
+                if entry[1] is not _removed:
+                    return entry[1]
+                bucket.pop() if self.lifo else bucket.popleft()
+                self.removed -= 1
+            self.min += 1
+        raise Exception('Trying to peek into empty BucketQueue.')
+
+    def __len__(self):
+        """Return current capacity of BucketQueue."""
+        return len(self.entries)
+
+    def __contains__(self, key):
+        """Return True if the key is in BucketQueue."""
+        return key in self.entries
+
+    def __getitem__(self, key):
+        """Returns the priority associated with key in BucketQueue.
+        Raises KeyError if key is not present."""
+        try:
+            return self.entries[key][0]
+        except KeyError:
+            raise KeyError(str(key) + " is not in the priority queue")
+
+    def __delitem__(self, key):
+        """Delete key from the BucketQueue."""
+        try:
+            self.entries.pop(key)[1] = _removed
+        except KeyError:
+            raise KeyError(str(key) + " is not in the priority queue")
+        self.removed += 1
+        self.compact()
+
+    def compact(self):
+        """Drop the tombstones from the buckets if they outnumber the live
+        entries (plus a margin), so that the buckets don't grow without bound;
+        O(n + buckets), amortized O(1) over the deletions and replacements
+        that made them."""
+        if self.removed > len(self.entries) + 64:
+            for index in range(self.min, len(self.buckets)):
+                bucket = self.buckets[index]
+                if bucket:
+                    self.buckets[index] = collections.deque(entry for entry in bucket if entry[1] is not _removed)
+            self.removed = 0
+
+    def truncate(self, n):
+        """Keep only the n items that would be popped first and drop the rest,
+        emptying buckets from the highest priority down."""
+        index = len(self.buckets) - 1
+        while len(self.entries) > n:
+            bucket = self.buckets[index]
+            while bucket and len(self.entries) > n:
+                item = (bucket.popleft() if self.lifo else bucket.pop())[1]
+                if item is not _removed:
+                    del self.entries[item]
+                else:
+                    self.removed -= 1
+            index -= 1
+
+
+def benchmark_priority_queue(sizes=(10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6), operations=10 ** 4):
+    """Print how PriorityQueue operations scale with the number of queued items.
+    For each size, a queue is filled with that many items and then timed on
+    membership tests, lookups, decrease-key (delete and re-insert) and pop/append
+    pairs, in microseconds per operation."""
+    import time
+
+    def per_op(fn, keys):
+        start = time.perf_counter()
+        for key in keys:
+            fn(key)
+        return 1e6 * (time.perf_counter() - start) / len(keys)
+
+    table = []
+    for size in sizes:
+        queue = PriorityQueue('min', lambda x: x % 1000)
+        queue.extend(range(size))
+        keys = random.sample(range(size), min(operations, size))
+
+        def decrease_key(key):
+            del queue[key]
+            queue.append(key)
+
+        table.append(['{:,}'.format(size),
+                      per_op(queue.__contains__, keys),
+                      per_op(queue.__getitem__, keys),
+                      per_op(decrease_key, keys),
+                      per_op(lambda key: queue.append(queue.pop()), keys)])
+    print_table(table, header=['Size', 'in (us)', 'lookup (us)', 'decrease-key (us)', 'pop+append (us)'],
+                numfmt='{:.2f}')
 
 
 # ______________________________________________________________________________